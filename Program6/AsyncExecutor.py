@@ -0,0 +1,157 @@
+from Executor import Executor
+from Compiler import PRINT
+from Summarizer import LOOP
+import asyncio, time
+
+'''
+Responsible for running BEEP programs as asyncio tasks. Execution
+is split into slices of yieldInterval lines and the executor yields
+to the event loop between slices, and after any PRINT whose output
+was flushed, so many programs share one event loop fairly. A task
+can be cancelled, or given a time budget, at any point it yields.
+The program is run only with executeAsync and resumeAsync.
+'''
+
+
+class YieldPoint(BaseException):
+    '''
+    Raised by a PRINT that flushed output to end the slice.
+    It is not an Exception so the interpreter does not report
+    it as an error on the line
+    '''
+    pass
+
+
+class AsyncExecutor(Executor):
+
+    YIELD_INTERVAL = 1000   # lines executed between yields to the event loop
+
+    __slots__ = ('yieldInterval',)
+
+    '''
+    Constructor for AsyncExecutor
+    '''
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+
+        self.yieldInterval = AsyncExecutor.YIELD_INTERVAL  # lines executed between yields
+
+    '''
+    Raises TypeError, as execute would let the exception that ends
+    a slice escape; use executeAsync
+    '''
+
+    def execute(self, fileList, verbose=False, stepBudget=None, timeBudget=None):
+
+        raise TypeError("an AsyncExecutor is run with executeAsync, not execute")
+
+    '''
+        Purpose:
+            Executes the BEEP source code, yielding to the event loop.
+
+        Parameters:
+            fileList    -  List of source lines to execute
+            verbose     -  Print each line as it is executed
+            timeBudget  -  Seconds the program may run, None for no budget
+
+        Notes:
+            As Executor.execute, with the output of each slice
+            flushed before the executor yields.
+
+        Return:
+            FINISHED, FAILED or SUSPENDED
+    '''
+
+    async def executeAsync(self, fileList, verbose=False, timeBudget=None):
+
+        self.source = fileList
+
+        self.compile()
+
+        self.out.write("execution begins ...\n")
+
+        return await self.resumeAsync(timeBudget, verbose)
+
+    '''
+        Purpose:
+            Continues a suspended execution, yielding to the event loop.
+
+        Parameters:
+            timeBudget  -  Seconds this call may run, None for no budget
+            verbose     -  Print each line as it is executed
+
+        Notes:
+            The time budget counts the time the program runs and the
+            time it waits for other tasks. Cancelling the task stops
+            the program the next time it yields; it is left suspended
+            and can be resumed.
+
+        Return:
+            FINISHED, FAILED or SUSPENDED
+    '''
+
+    async def resumeAsync(self, timeBudget=None, verbose=False):
+
+        deadline = time.perf_counter() + timeBudget if timeBudget != None else None
+
+        while True:
+
+            remaining = None
+
+            if deadline != None:
+                remaining = deadline - time.perf_counter()
+
+                if remaining <= 0:
+                    self.state = Executor.SUSPENDED
+
+                    return self.state
+
+            try:
+                state = self.resume(self.yieldInterval, remaining, verbose)
+
+            # the PRINT that ended the slice has executed but is not counted yet
+            except YieldPoint:
+                self.execCount += 1
+
+                state = self.state = Executor.SUSPENDED
+
+            if state != Executor.SUSPENDED or self.limitReached():
+                return state
+
+            await asyncio.sleep(0)
+
+    '''
+    Executes a PRINT and ends the slice if its output was flushed
+    '''
+
+    def execPrintYield(self, instr):
+
+        flushes = self.out.flushes
+
+        self.execPrint(instr)
+
+        if self.out.flushes != flushes:
+            raise YieldPoint()
+
+    '''
+    Executes a summarized loop and ends the slice if the PRINTs
+    of its trips, or its IF, flushed output. The trips never run
+    past the end of the slice
+    '''
+
+    def execLoopYield(self, instr):
+
+        flushes = self.out.flushes
+
+        self.execLoop(instr)
+
+        if self.out.flushes != flushes:
+            raise YieldPoint()
+
+    HANDLERS = dict(Executor.HANDLERS)
+
+    HANDLERS[PRINT] = execPrintYield
+
+    HANDLERS[LOOP] = execLoopYield
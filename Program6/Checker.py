@@ -0,0 +1,323 @@
+from Compiler import ASSIGN, PRINT, GOTO, IF
+from ControlFlow import buildBlocks
+from Specializer import inferKinds, typeErrors
+
+'''
+Responsible for checking a decoded BEEP program before it runs:
+branches to undefined labels, lines that can never be reached,
+loops that can never end because no variable changes in them and
+lines that fail on the kinds of value their variables hold
+'''
+
+# severity of a diagnostic, a program with an error is not run
+ERROR   = 'error'
+WARNING = 'warning'
+
+# opcodes of the lines reported as unreachable, comments and declarations are not
+STATEMENTS = (ASSIGN, PRINT, GOTO, IF)
+
+
+class Diagnostic:
+
+    '''
+    Constructor for Diagnostic
+    '''
+
+    def __init__(self, lineNum, severity, message):
+
+        self.lineNum = lineNum      # line the problem is reported on
+
+        self.severity = severity    # ERROR or WARNING
+
+        self.message = message      # description of the problem
+
+    def __str__(self):
+        return "*** line %d %s: %s ***" % (self.lineNum, self.severity, self.message)
+
+
+'''
+    Purpose:
+        Checks a decoded program.
+
+    Parameters:
+        code       -  List of Instruction, one per source line
+        labelD     -  Dictionary with mapping of label name to line number
+        varValueD  -  Dictionary with mapping of var name to declared
+                      value, None to skip the type check
+        slotD      -  Dictionary with mapping of var name to slot
+
+    Notes:
+        A loop in which no line is an ASSIGN repeats the same state
+        forever once it has gone round. If nothing leaves the loop it
+        is an error; if it has a way out it is a warning, since it
+        only ends if it leaves on its first pass.
+        A line that can be reached and fails whatever values its
+        variables hold, such as + on a variable that is only ever a
+        string, is an error.
+
+    Return:
+        List of Diagnostic in line order
+'''
+def checkProgram(code, labelD, varValueD=None, slotD=None):
+
+    blockD = buildBlocks(code, labelD)
+
+    diagnostics = []
+
+    for instr in code:
+
+        if instr.opcode in (GOTO, IF) and instr.target == None:
+            diagnostics.append(Diagnostic(instr.lineNum, WARNING, "label %s is not defined" % (instr.label)))
+
+    reached = reachableBlocks(blockD)
+
+    diagnostics.extend(unreachableLines(blockD, reached))
+
+    for loop in findLoops(blockD, reached):
+        diagnostics.extend(checkLoop(blockD, loop))
+
+    if varValueD != None:
+        reachedLines = {instr.lineNum for start in reached for instr in blockD[start].instrs}
+
+        for lineNum, message in typeErrors(code, inferKinds(code, varValueD, slotD)):
+
+            if lineNum in reachedLines:
+                diagnostics.append(Diagnostic(lineNum, ERROR, "type error, %s" % (message)))
+
+    diagnostics.sort(key=lambda diagnostic: diagnostic.lineNum)
+
+    return diagnostics
+
+
+'''
+Returns the diagnostics that are errors
+'''
+def errors(diagnostics):
+
+    return [diagnostic for diagnostic in diagnostics if diagnostic.severity == ERROR]
+
+
+'''
+Returns the set of start lines of the blocks
+reachable from the first line
+'''
+def reachableBlocks(blockD):
+
+    reached = set()
+
+    stack = [1] if 1 in blockD else []
+
+    while stack:
+
+        start = stack.pop()
+
+        if start in reached:
+            continue
+
+        reached.add(start)
+
+        stack.extend(succ for succ in blockD[start].succs if succ in blockD)
+
+    return reached
+
+
+'''
+Returns a warning for each run of consecutive unreachable
+blocks that holds a statement
+'''
+def unreachableLines(blockD, reached):
+
+    diagnostics = []
+
+    first = last = None
+
+    # None at the end closes the last run
+    for start in list(blockD) + [None]:
+
+        if start != None and start not in reached:
+
+            for instr in blockD[start].instrs:
+
+                if instr.opcode in STATEMENTS:
+
+                    if first == None:
+                        first = instr.lineNum
+
+                    last = instr.lineNum
+
+            continue
+
+        if first != None:
+            verb = "is" if first == last else "are"
+
+            diagnostics.append(Diagnostic(first, WARNING, "%s %s never executed" % (lineRange(first, last), verb)))
+
+            first = last = None
+
+    return diagnostics
+
+
+'''
+Describes the lines first to last in a message
+'''
+def lineRange(first, last):
+
+    return "line %d" % (first) if first == last else "lines %d-%d" % (first, last)
+
+
+'''
+    Purpose:
+        Finds the loops of the control flow graph.
+
+    Notes:
+        A loop is a strongly connected set of blocks with at least
+        one edge inside it. Tarjan's algorithm is run with an
+        explicit stack so a long program cannot exhaust recursion.
+
+    Return:
+        List of sets of block start lines
+'''
+def findLoops(blockD, reached):
+
+    index = {}      # dictionary of block start line to visit order
+
+    lowLink = {}    # dictionary of block start line to lowest visit order reachable
+
+    onStack = set()
+
+    stack = []
+
+    loops = []
+
+    for root in sorted(reached):
+
+        if root in index:
+            continue
+
+        work = [(root, 0)]
+
+        while work:
+
+            start, position = work.pop()
+
+            if position == 0:
+                index[start] = lowLink[start] = len(index)
+
+                stack.append(start)
+
+                onStack.add(start)
+
+            succs = [succ for succ in blockD[start].succs if succ in blockD]
+
+            if position < len(succs):
+                work.append((start, position + 1))
+
+                succ = succs[position]
+
+                if succ not in index:
+                    work.append((succ, 0))
+
+                elif succ in onStack:
+                    lowLink[start] = min(lowLink[start], index[succ])
+
+                continue
+
+            # all successors visited, pass the low link up to the caller
+            if work:
+                caller = work[-1][0]
+
+                lowLink[caller] = min(lowLink[caller], lowLink[start])
+
+            if lowLink[start] == index[start]:
+                component = set()
+
+                while True:
+                    member = stack.pop()
+
+                    onStack.discard(member)
+
+                    component.add(member)
+
+                    if member == start:
+                        break
+
+                if len(component) > 1 or start in blockD[start].succs:
+                    loops.append(component)
+
+    return loops
+
+
+'''
+    Purpose:
+        Checks a loop for lines that change a variable.
+
+    Notes:
+        A loop with no way out is only an error if the program
+        cannot end without entering it; an IF or GOTO to an
+        undefined label is a way out, since it stops execution.
+
+    Return:
+        List of Diagnostic
+'''
+def checkLoop(blockD, loop):
+
+    blocks = [blockD[start] for start in sorted(loop)]
+
+    for block in blocks:
+
+        if any(instr.opcode == ASSIGN for instr in block.instrs):
+            return []
+
+    first = blocks[0].start
+
+    lines = lineRange(first, max(block.end for block in blocks))
+
+    if any(canStop(block, loop) for block in blocks):
+        return [Diagnostic(first, WARNING, "no variable changes in the loop at %s, it only ends on its first pass" % (lines))]
+
+    if canEnd(blockD, loop):
+        return [Diagnostic(first, WARNING, "the loop at %s never ends once entered, no variable changes in it" % (lines))]
+
+    return [Diagnostic(first, ERROR, "the loop at %s never ends, no variable changes in it" % (lines))]
+
+
+'''
+True if execution can leave block for a line outside
+the blocks in avoid, or stop in it on a branch
+'''
+def canStop(block, avoid):
+
+    if any(succ not in avoid for succ in block.succs):
+        return True
+
+    return any(instr.opcode in (GOTO, IF) and instr.target == None for instr in block.instrs)
+
+
+'''
+True if execution can run from the first line to the end
+of the program, or stop on a branch, without entering loop
+'''
+def canEnd(blockD, loop):
+
+    reached = set()
+
+    stack = [1] if 1 in blockD and 1 not in loop else []
+
+    while stack:
+
+        start = stack.pop()
+
+        if start in reached:
+            continue
+
+        reached.add(start)
+
+        block = blockD[start]
+
+        if any(succ not in blockD for succ in block.succs) or \
+                any(instr.opcode in (GOTO, IF) and instr.target == None for instr in block.instrs):
+            return True
+
+        stack.extend(succ for succ in block.succs if succ not in loop)
+
+    return False
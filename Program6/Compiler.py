@@ -0,0 +1,302 @@
+from Lexer import scanLine, tokenize
+import re
+
+'''
+Responsible for compiling BEEP source code into a list of
+decoded instructions, one per source line, so the Executor
+never has to regex match a line more than once
+'''
+
+# opcodes of decoded instructions
+BLANK  = 'BLANK'    # blank line, skipped and not counted as executed
+NOP    = 'NOP'      # comment, VAR declaration or unrecognized statement
+ASSIGN = 'ASSIGN'
+PRINT  = 'PRINT'
+GOTO   = 'GOTO'
+IF     = 'IF'
+
+# value of a variable slot that has never been assigned
+UNDEFINED = object()
+
+# literal regular expressions; lines are matched by Lexer.lineRE
+stringRE = re.compile(r'"(.*)"')
+intRE    = re.compile(r'^\d+$')
+
+
+class Instruction:
+
+    '''
+    Constructor for Instruction
+    '''
+
+    def __init__(self, opcode, lineNum, text, op=None, operands=(), label=None, target=None):
+
+        self.opcode = opcode        # kind of statement
+
+        self.lineNum = lineNum      # source line the instruction was decoded from
+
+        self.text = text            # source line as it appears in the file
+
+        self.op = op                # operator of an ASSIGN or IF
+
+        self.operands = operands    # operand tokens of the statement
+
+        self.label = label          # label branched to by GOTO or IF
+
+        self.target = target        # line number of label, None if not defined
+
+    def __repr__(self):
+        return "%d. %s %s %s %s" % (self.lineNum, self.opcode, self.op or "", " ".join(map(str, self.operands)), self.label or "")
+
+
+class Operand:
+
+    '''
+    Constructor for Operand
+    '''
+
+    def __init__(self, text, slot=None, const=None):
+
+        self.text = text            # token as it appears in the source
+
+        self.slot = slot            # variable slot, None if token is not a variable
+
+        self.const = const          # value of token as a literal, None if not a literal
+
+    def __str__(self):
+        return self.text
+
+
+'''
+Decodes a single line of BEEP source code into an instruction
+'''
+def compileLine(line, lineNum, labelD):
+
+    return compileToken(scanLine(line), lineNum, labelD)
+
+
+'''
+    Purpose:
+        Decodes the token of a line of BEEP source code into an instruction.
+
+    Parameters:
+        token    -  Token of the source line, from the Lexer
+        lineNum  -  Line number of the source line
+        labelD   -  Dictionary with mapping of label name to line number
+
+    Notes:
+        The Lexer tries the statements in the same order the Executor
+        used to try them at runtime, so a line decodes to exactly the
+        statement it used to execute as.
+        Labels are resolved to line numbers here; an undefined label
+        leaves target as None and is reported when the branch runs.
+
+    Return:
+        Instruction for the source line
+'''
+def compileToken(token, lineNum, labelD):
+
+    opcode = token.lastgroup
+
+    line = token.string
+
+    if opcode == ASSIGN:
+        op, varName, var1, var2 = token.group('assignOp', 'target', 'arg1', 'arg2')
+
+        return Instruction(ASSIGN, lineNum, line, op=op, operands=(varName, var1, var2))
+
+    if opcode == PRINT:
+        return Instruction(PRINT, lineNum, line, operands=tuple(token.group('items').split()))
+
+    if opcode == GOTO:
+        label = token.group('gotoLabel')
+
+        return Instruction(GOTO, lineNum, line, label=label, target=labelD.get(label.upper(), None))
+
+    if opcode == IF:
+        op, var1, var2, label = token.group('ifOp', 'ifArg1', 'ifArg2', 'ifLabel')
+
+        return Instruction(IF, lineNum, line, op=op, operands=(var1, var2),
+                           label=label, target=labelD.get(label.upper(), None))
+
+    return Instruction(opcode, lineNum, line)
+
+
+'''
+    Purpose:
+        Compiles BEEP source code into a list of decoded instructions.
+
+    Parameters:
+        source  -  List of source lines
+        labelD  -  Dictionary with mapping of label name to line number
+        slotD   -  Dictionary with mapping of var name to slot,
+                   extended with any variable the source assigns
+        tokens  -  List of tokens of the source lines from the loader,
+                   None to tokenize the source here
+
+    Notes:
+        The instruction for line n is at index n - 1, so line numbers
+        and label targets can be used to index the list directly.
+
+    Return:
+        List of Instruction
+'''
+def compileSource(source, labelD, slotD=None, tokens=None):
+
+    if slotD == None:
+        slotD = {}
+
+    if tokens == None:
+        tokens = tokenize(source)
+
+    code = [compileToken(token, lineNum, labelD) for lineNum, token in enumerate(tokens, 1)]
+
+    resolveOperands(code, slotD)
+
+    return code
+
+
+'''
+    Purpose:
+        Returns the slot of a variable, allocating the next
+        free slot if the variable does not have one yet.
+
+    Parameters:
+        name   -  Variable name as it appears in the source
+        slotD  -  Dictionary with mapping of var name to slot
+
+    Return:
+        Slot of the variable
+'''
+def allocSlot(name, slotD):
+
+    name = name.upper()
+
+    if slotD.get(name, None) == None:
+        slotD[name] = len(slotD)
+
+    return slotD[name]
+
+
+'''
+    Purpose:
+        Classifies a token as a string or numeric constant.
+
+    Parameters:
+        token    -  Token as it appears in the source
+        numeric  -  Parse a numeric constant as an int, otherwise
+                    its digits are kept as a string
+
+    Notes:
+        String constants are checked first, as evalSymbol did.
+
+    Return:
+        Value of the constant or None if token is not a constant
+'''
+def parseLiteral(token, numeric=True):
+
+    stringMO = stringRE.match(token)
+
+    if stringMO != None:
+        return stringMO.group(1)
+
+    elif intRE.match(token) != None:
+        return int(token) if numeric else token
+
+    return None
+
+
+'''
+    Purpose:
+        Builds the Operand for a token.
+
+    Parameters:
+        token    -  Token as it appears in the source
+        slotD    -  Dictionary with mapping of var name to slot
+        numeric  -  Parse a numeric constant as an int
+
+    Return:
+        Operand
+'''
+def makeOperand(token, slotD, numeric=True):
+
+    return Operand(token, slotD.get(token.upper(), None), parseLiteral(token, numeric))
+
+
+'''
+    Purpose:
+        Replaces the operand tokens of each instruction with
+        Operands that refer to variables by slot.
+
+    Parameters:
+        code   -  List of Instruction
+        slotD  -  Dictionary with mapping of var name to slot
+
+    Notes:
+        ASSIGN can create a variable that was never declared, so
+        every ASSIGN target is given a slot before any operand is
+        resolved. The variable operand of + and - is always given
+        a slot since it is never read as a constant.
+        Any other token is a variable only if it has a slot.
+        Literals are parsed once here. A numeric constant is an int
+        except where it is used as a string: both operands of & and
+        the string replicated by *.
+
+    Return:
+        Void
+'''
+def resolveOperands(code, slotD):
+
+    for instr in code:
+        allocAssignSlots(instr, slotD)
+
+    for instr in code:
+        resolveInstruction(instr, slotD)
+
+
+'''
+    Purpose:
+        Gives the variables an ASSIGN creates or reads by name a slot.
+
+    Parameters:
+        instr  -  Instruction with its operand tokens
+        slotD  -  Dictionary with mapping of var name to slot
+
+    Return:
+        Void
+'''
+def allocAssignSlots(instr, slotD):
+
+    if instr.opcode == ASSIGN:
+        allocSlot(instr.operands[0], slotD)
+
+        if instr.op in ('+', '-') and instr.operands[2] != None:
+            allocSlot(instr.operands[1], slotD)
+
+
+'''
+    Purpose:
+        Replaces the operand tokens of one instruction with Operands.
+
+    Parameters:
+        instr  -  Instruction with its operand tokens
+        slotD  -  Dictionary with mapping of var name to slot, which
+                  must already have a slot for every ASSIGN target
+
+    Return:
+        Void
+'''
+def resolveInstruction(instr, slotD):
+
+    if instr.opcode == ASSIGN:
+        varName, var1, var2 = instr.operands
+
+        var1 = makeOperand(var1, slotD, instr.op not in ('*', '&'))
+
+        if var2 != None:
+            var2 = makeOperand(var2, slotD, instr.op != '&')
+
+        instr.operands = (Operand(varName, slotD[varName.upper()]), var1, var2)
+
+    elif instr.opcode in (PRINT, IF):
+        instr.operands = tuple(makeOperand(token, slotD) for token in instr.operands)
@@ -0,0 +1,199 @@
+from Compiler import Instruction, BLANK, GOTO, IF
+
+'''
+Responsible for splitting decoded instructions into basic blocks,
+linking the blocks into a control flow graph and fusing the
+instructions of a block into superinstructions, so the Executor
+dispatches once for a run of lines instead of once per line
+'''
+
+# opcode of a superinstruction
+FUSED = 'FUSED'
+
+# IF operators that can branch, an IF with any other operator never does
+BRANCH_OPS = ('>', '>=', '<', '<=')
+
+# most GOTOs followed from one superinstruction
+MAX_GOTO_CHAIN = 8
+
+
+class BasicBlock:
+
+    '''
+    Constructor for BasicBlock
+    '''
+
+    def __init__(self, start):
+
+        self.start = start          # line number of the first line of the block
+
+        self.end = start            # line number of the last line of the block
+
+        self.instrs = []            # instructions of the block that are not blank
+
+        self.succs = []             # start lines of the blocks control can pass to, in order
+
+        self.preds = []             # start lines of the blocks control can come from
+
+    '''
+    Number of lines counted as executed when the whole block runs
+    '''
+
+    def count(self):
+
+        return len(self.instrs)
+
+    def __repr__(self):
+        return "block %d-%d -> %s" % (self.start, self.end, self.succs)
+
+
+class Superinstruction(Instruction):
+
+    '''
+    Constructor for Superinstruction
+
+    parts is a list of (entry, instruction), entry being the lineNum
+    the previous part must leave for the instruction to run next
+    '''
+
+    def __init__(self, first, parts):
+
+        super().__init__(FUSED, first.lineNum, first.text)
+
+        self.first = first          # instruction executed when the superinstruction is dispatched
+
+        self.parts = parts          # list of (entry, instruction) that may follow it
+
+
+'''
+    Purpose:
+        Splits the instructions into basic blocks and links them.
+
+    Parameters:
+        code    -  List of Instruction, one per source line
+        labelD  -  Dictionary with mapping of label name to line number;
+                   every label starts a block. If None only lines
+                   that are branched to start a block
+
+    Notes:
+        A block also starts at the first line and after every GOTO
+        and IF. An IF branches to its label or falls through, a GOTO
+        only branches; a branch to an undefined label has no
+        successor since it stops execution. The last block falls
+        through to line len(code) + 1, which is not a block.
+
+    Return:
+        Dictionary with mapping of block start line to BasicBlock,
+        in line order
+'''
+def buildBlocks(code, labelD=None):
+
+    numLines = len(code)
+
+    starts = {1}
+
+    if labelD != None:
+        starts.update(lineNum for lineNum in labelD.values() if lineNum <= numLines)
+
+    for instr in code:
+
+        if instr.opcode in (GOTO, IF):
+            starts.add(instr.lineNum + 1)
+
+            if instr.target != None:
+                starts.add(instr.target)
+
+    blockD = {}
+
+    block = None
+
+    for instr in code:
+
+        if instr.lineNum in starts:
+            block = blockD[instr.lineNum] = BasicBlock(instr.lineNum)
+
+        block.end = instr.lineNum
+
+        if instr.opcode != BLANK:
+            block.instrs.append(instr)
+
+    for block in blockD.values():
+
+        last = block.instrs[-1] if block.instrs else None
+
+        if last != None and last.opcode == GOTO:
+            block.succs = [last.target] if last.target != None else []
+
+        elif last != None and last.opcode == IF and last.op in BRANCH_OPS and last.target != None:
+            block.succs = [last.target, block.end + 1]
+
+        else:
+            block.succs = [block.end + 1]
+
+        for succ in block.succs:
+
+            if succ in blockD:
+                blockD[succ].preds.append(block.start)
+
+    return blockD
+
+
+'''
+    Purpose:
+        Builds the superinstructions of a program.
+
+    Parameters:
+        code  -  List of Instruction, one per source line
+
+    Notes:
+        Blocks are split only where a line is branched to, a label
+        nothing branches to does not end a superinstruction.
+        Each block of two or more lines becomes a superinstruction
+        at its first line; for example an ASSIGN that counts a loop
+        and the IF that tests it are dispatched once. A block that
+        ends in a GOTO to a line that is another GOTO also takes in
+        that GOTO, and the one after it, up to MAX_GOTO_CHAIN. The
+        other lines keep their instruction, so execution can still
+        start or resume on any line.
+
+    Return:
+        List of Instruction and Superinstruction, one per source line
+'''
+def fuseBlocks(code):
+
+    fused = list(code)
+
+    for block in buildBlocks(code).values():
+
+        if not block.instrs:
+            continue
+
+        parts = []
+
+        prev = block.instrs[0]
+
+        for instr in block.instrs[1:]:
+            parts.append((prev.lineNum + 1, instr))
+
+            prev = instr
+
+        # follow a GOTO to a GOTO, each line once
+        seen = {instr.lineNum for instr in block.instrs}
+
+        while prev.opcode == GOTO and prev.target != None and len(seen) < len(block.instrs) + MAX_GOTO_CHAIN:
+
+            instr = code[prev.target - 1]
+
+            if instr.opcode != GOTO or instr.lineNum in seen:
+                break
+
+            parts.append((prev.target, instr))
+
+            seen.add(instr.lineNum)
+
+            prev = instr
+
+        if parts:
+            fused[block.instrs[0].lineNum - 1] = Superinstruction(block.instrs[0], parts)
+
+    return fused
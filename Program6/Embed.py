@@ -0,0 +1,268 @@
+from p6Driver import parseSource, collectorPaused
+from Executor import Executor
+from FastTier import FastExecutor, Translator
+from AsyncExecutor import AsyncExecutor
+from OutputSink import OutputSink
+from Compiler import compileSource
+from Optimizer import foldConstants
+from ControlFlow import fuseBlocks
+from Specializer import inferKinds, specializeCode
+from Summarizer import summarizeLoops
+from types import MappingProxyType
+import io
+
+'''
+Responsible for running BEEP programs from Python. A program is
+loaded and compiled once into a CompiledProgram that is never
+changed, then run any number of times, each run with its own
+variables, optional initial values and captured output. Nothing is
+listed or printed while loading or running.
+
+    program = load("p6InputA.txt")
+
+    result = run(program, {"count": 10})
+
+    print(result.output)
+
+runAsync runs a program as an asyncio task instead, and runVariants
+runs it once for each of many sets of initial values.
+'''
+
+
+class CompiledProgram:
+
+    '''
+    Constructor for CompiledProgram
+    '''
+
+    def __init__(self, name, varTypeD, varValueD, labelD, slotD, source, code, errors):
+
+        self.name = name                                # file name of the source, or name given with the text
+
+        self.varTypeD = MappingProxyType(varTypeD)      # dictionary for var data type
+
+        self.varValueD = MappingProxyType(varValueD)    # dictionary for declared var value
+
+        self.labelD = MappingProxyType(labelD)          # dictionary for labels
+
+        self.slotD = MappingProxyType(slotD)            # dictionary for var slot
+
+        self.source = tuple(source)                     # source lines
+
+        self.errors = tuple(errors)                     # (line number, message) of each load error
+
+        self.code = code                                # decoded instructions with literal expressions folded
+
+        self.kindD = inferKinds(code, varValueD, slotD) # dictionary of slot to the kinds of value it holds
+
+        # specialized instructions with superinstructions and loop summaries
+        self.fused = summarizeLoops(specializeCode(fuseBlocks(code), self.kindD), code)
+
+        self.translated = None                          # (program function, blockD) of the fast tier, None if not translated
+
+    def __repr__(self):
+        return "CompiledProgram(%s, %d lines)" % (self.name, len(self.source))
+
+
+class RunResult:
+
+    '''
+    Constructor for RunResult
+    '''
+
+    def __init__(self, state, output, execCount, error, variables):
+
+        self.state = state          # FINISHED, FAILED or SUSPENDED
+
+        self.output = output        # everything the run printed
+
+        self.execCount = execCount  # count of lines executed
+
+        self.error = error          # message of the error that ended the run, None if none
+
+        self.variables = variables  # dictionary of var name to value at the end of the run
+
+
+'''
+    Purpose:
+        Loads and compiles a BEEP program.
+
+    Parameters:
+        filename  -  Path of the BEEP source, or the name of the
+                     program if text is given
+        text      -  BEEP source as a string, None to read filename
+        fast      -  Translate the program for the fast tier, so
+                     every run executes in it from the first line
+
+    Notes:
+        Errors found while loading, such as a label on more than
+        one line, are kept in errors rather than printed.
+        Only expressions of literals are folded: a variable that is
+        never assigned can still be given a value by each run.
+        Instructions are specialized to the kinds of the declared
+        values; a run given a value of another kind uses the
+        generic instructions.
+
+    Return:
+        CompiledProgram
+'''
+def load(filename, text=None, fast=False):
+
+    out = OutputSink(capture=True)
+
+    errors = []
+
+    tokens = []
+
+    if text == None:
+        file = open(filename, "r", encoding='latin-1')
+
+    else:
+        file = io.StringIO(text)
+
+    try:
+
+        with collectorPaused():
+            varTypeD, varValueD, labelD, slotD, source = parseSource(file, filename, out, False, errors, tokens)
+
+            code = foldConstants(compileSource(source, labelD, slotD, tokens), {})
+
+    finally:
+        file.close()
+
+    program = CompiledProgram(filename, varTypeD, varValueD, labelD, slotD, source, code, errors)
+
+    if fast:
+        translator = Translator(code)
+
+        program.translated = (translator.translate(), translator.blockD)
+
+    return program
+
+
+'''
+    Purpose:
+        Runs a compiled program with fresh variables.
+
+    Parameters:
+        program    -  CompiledProgram returned by load
+        overrides  -  Dictionary of var name to initial value, replacing
+                      the declared value; names are not case sensitive
+        stepLimit  -  Lines executed before the run is suspended,
+                      None for no limit
+        timeLimit  -  Seconds the run may take, None for no limit
+
+    Notes:
+        Raises KeyError for a variable the program neither declares
+        nor assigns. The output includes the lines the executor
+        writes when execution begins and ends.
+
+    Return:
+        RunResult
+'''
+def run(program, overrides=None, stepLimit=Executor.EXECUTION_LIMIT, timeLimit=None):
+
+    executorClass = FastExecutor if program.translated != None else Executor
+
+    executor = newExecutor(program, overrides, stepLimit, executorClass)
+
+    if program.translated != None:
+        executor.program, executor.blockD = program.translated
+
+    state = executor.execute(program.source, timeBudget=timeLimit)
+
+    return RunResult(state, executor.out.getvalue(), executor.execCount, executor.error, executor.variableValues())
+
+
+'''
+    Purpose:
+        Runs a compiled program once for each set of initial values.
+
+    Parameters:
+        program    -  CompiledProgram returned by load
+        variants   -  Iterable of dictionaries of var name to initial
+                      value, as the overrides of run
+        stepLimit  -  Lines each run may execute, None for no limit
+        timeLimit  -  Seconds each run may take, None for no limit
+
+    Notes:
+        Every run is a fork of one executor, so the runs share the
+        source, labels and instructions; each run copies the list
+        of variable slots, one reference per variable, when it
+        starts.
+        Raises KeyError for a variable the program neither declares
+        nor assigns.
+
+    Return:
+        List of RunResult, one for each variant in order
+'''
+def runVariants(program, variants, stepLimit=Executor.EXECUTION_LIMIT, timeLimit=None):
+
+    executor = newExecutor(program, None, stepLimit, Executor)
+
+    executor.source = program.source
+
+    results = []
+
+    for overrides in variants:
+        variant = executor.fork(OutputSink(capture=True), overrides)
+
+        state = variant.execute(program.source, timeBudget=timeLimit)
+
+        results.append(RunResult(state, variant.out.getvalue(), variant.execCount, variant.error,
+                                 variant.variableValues()))
+
+    return results
+
+
+'''
+    Purpose:
+        Runs a compiled program as an asyncio task.
+
+    Notes:
+        As run, but the program yields to the event loop as an
+        AsyncExecutor does and is never run in the fast tier.
+        Cancelling the task cancels the run.
+
+    Return:
+        RunResult
+'''
+async def runAsync(program, overrides=None, stepLimit=Executor.EXECUTION_LIMIT, timeLimit=None):
+
+    executor = newExecutor(program, overrides, stepLimit, AsyncExecutor)
+
+    state = await executor.executeAsync(program.source, timeBudget=timeLimit)
+
+    return RunResult(state, executor.out.getvalue(), executor.execCount, executor.error, executor.variableValues())
+
+
+'''
+Builds an executor of executorClass over the shared instructions
+of program, with its own variables and captured output
+'''
+def newExecutor(program, overrides, stepLimit, executorClass):
+
+    varValueD = dict(program.varValueD)
+
+    if overrides != None:
+
+        for name, value in overrides.items():
+
+            if name.upper() not in program.slotD:
+                raise KeyError("%s is not a variable of %s" % (name, program.name))
+
+            varValueD[name.upper()] = value
+
+    executor = executorClass(program.varTypeD, varValueD, program.labelD, program.source, program.slotD,
+                             OutputSink(capture=True), program.code)
+
+    executor.folded = True
+
+    executor.fused = program.fused
+
+    # checked against the values given when the executor compiles
+    executor.kindD = program.kindD
+
+    executor.executionLimit = stepLimit
+
+    return executor
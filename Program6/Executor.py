@@ -1,5 +1,12 @@
-import re, sys
+import time, types
 from p5Dict import printVariables
+from OutputSink import OutputSink
+from Rope import Rope, concatValues, repeatValue
+from Compiler import compileSource, BLANK, NOP, ASSIGN, PRINT, GOTO, IF, UNDEFINED
+from ControlFlow import fuseBlocks, FUSED
+from Optimizer import constantSlots, foldConstants
+from Specializer import inferKinds, specializeCode, valueKind, INT_ADD, INT_IF, STR_CONCAT, STR_REPEAT
+from Summarizer import summarizeLoops, tripCount, LOOP, APPEND, PREPEND
 
 '''
 Responsible for executing BEEP source code,
@@ -11,11 +18,28 @@ class Executor:
 
     EXECUTION_LIMIT = 5000
 
+    TIME_CHECK_INTERVAL = 256   # lines executed between reads of the clock
+
+    PRINT_TRIPS = 1024          # trips of a summarized loop whose output is written at once
+
+    # states returned by execute and resume
+    FINISHED  = 'finished'      # ran past the last line of the source
+    FAILED    = 'failed'        # stopped on a line error
+    SUSPENDED = 'suspended'     # stopped by a budget or the execution limit
+
+    __slots__ = ('varTypeD', 'varValueD', 'labelD', 'source', 'lineNum', 'execCount', 'code', 'folding', 'folded',
+                 'constSlots', 'fusion', 'fused', 'specializing', 'summarizing', 'kindD', 'slotD', 'values', 'shared', 'out',
+                 'executionLimit', 'state', 'error', 'stopCount', 'handlers', 'onError')
+
     '''
     Constructor for Executor
+
+    The executor never changes varTypeD, varValueD, labelD, source,
+    slotD once it is compiled, or code, so they can be shared with
+    other executors and with its forks
     '''
 
-    def __init__(self, varTypeD, varValueD, labelD, source):
+    def __init__(self, varTypeD, varValueD, labelD, source, slotD=None, out=None, code=None):
 
         self.varTypeD = varTypeD    # dictionary for var data type
 
@@ -29,140 +53,791 @@ class Executor:
 
         self.execCount = 0          # count of lines executed
 
+        self.code = code            # decoded instructions, one per source line
+
+        self.folding = True         # fold constant expressions before execution
+
+        self.folded = False         # True once the constant expressions of code are folded
+
+        self.constSlots = frozenset()   # slots of the variables whose value is folded into code
+
+        self.fusion = True          # dispatch each basic block as one superinstruction
+
+        self.fused = None           # instructions with superinstructions, None until compiled
+
+        self.specializing = True    # specialize the superinstructions to the kinds of their operands
+
+        self.summarizing = True     # apply the trips of counted loops at once
+
+        self.kindD = None           # dictionary of slot to the kinds of value it holds, None if not specialized
+
+        # slot of each variable, declared variables first
+        if slotD == None:
+            slotD = {name: slot for slot, name in enumerate(varValueD)}
+
+        self.slotD = slotD          # dictionary for var slot
+
+        self.values = None          # list of var values, indexed by slot
+
+        self.shared = False         # True while values is shared with a fork, copied whole before it is written
+
+        self.out = out if out != None else OutputSink()    # sink for program output
+
+        self.executionLimit = Executor.EXECUTION_LIMIT     # total lines executed before suspending, None for no limit
+
+        self.state = None           # state of the last execute or resume
+
+        self.error = None           # message of the error that ended execution
+
+        self.stopCount = None       # execCount at which the current run is suspended
+
+        self.handlers = None        # handlers of HANDLERS bound to this executor, None until it first runs
+
+        self.onError = None         # called after a line error is reported, None for nothing
+
     '''
-         Purpose: 
-            Prints the type and value of variable in the BEEP source code. 
+         Purpose:
+            Executes the BEEP source code.
 
         Parameters:
-            varTypeD  -  Dictionary with mapping of var name to data type
-            varValueD -  Dictionary with mapping of var name to value
+            fileList    -  List of source lines to execute
+            verbose     -  Print each line as it is executed
+            stepBudget  -  Lines this call may execute, None for no budget
+            timeBudget  -  Seconds this call may run, None for no budget
 
         Notes:
-            Sorts keys in the varTypeD and varValueD dictionaries
-            in ascending order.
+            The source is decoded into instructions once before
+            execution begins; the loop only walks the instructions.
+            Output goes to the executor's OutputSink, which is
+            flushed when execution stops for any reason.
+            Execution is suspended when a budget runs out or
+            executionLimit lines have been executed in total.
 
         Return:
-            Void
+            FINISHED, FAILED or SUSPENDED
     '''
 
-    def execute(self, fileList, verbose=False):
-
-        commentRE = re.compile(r'#')
-        printRE = re.compile(r'\s*[\w:]*\s*PRINT\s+(.*)$')
-        gotoRE = re.compile(r'\s*[\w:]*\s*GOTO\s+(\w+)$')
-        assignRE = re.compile(r'\s*ASSIGN\s+(\w+)\s+([+\-*&>=<%]+)?\s*(\w+)\s*(\w+)?$')
-        ifRE = re.compile(r'\s*([\w\W]*)[Ii][fF]\s+(([><=]+)\s+(\w+)\s(\w+))\s(\w+)$')
+    def execute(self, fileList, verbose=False, stepBudget=None, timeBudget=None):
 
         self.source = fileList
 
-        print("execution begins ...")
+        self.compile()
+
+        self.out.write("execution begins ...\n")
+
+        return self.resume(stepBudget, timeBudget, verbose)
+
+    '''
+         Purpose:
+            Continues a suspended execution from the line it
+            stopped at.
+
+        Parameters:
+            stepBudget  -  Lines this call may execute, None for no budget
+            timeBudget  -  Seconds this call may run, None for no budget
+            verbose     -  Print each line as it is executed
+
+        Notes:
+            The program is not decoded and the variables are not
+            declared again, the executor carries on with its own
+            lineNum, execCount and variable slots. Raise
+            executionLimit before resuming a program suspended
+            at the limit.
+
+        Return:
+            FINISHED, FAILED or SUSPENDED
+    '''
+
+    def resume(self, stepBudget=None, timeBudget=None, verbose=False):
+
+        # the slot list shared with a fork is copied whole before it can be written
+        if self.shared:
+            self.values = list(self.values)
+
+            self.shared = False
+
+        try:
+            self.state = self.run(verbose, stepBudget, timeBudget)
+
+        # output is flushed however execution stops
+        finally:
+            self.out.flush()
 
-        while self.lineNum <= len(self.source):
+        return self.state
 
-            line = self.source[self.lineNum - 1]
+    def run(self, verbose, stepBudget, timeBudget):
 
-            if self.execCount == Executor.EXECUTION_LIMIT:
-                print("Infinite loop most likely encountered")
+        stopCount, deadline = self.limits(stepBudget, timeBudget)
 
-                sys.exit(1)
+        return self.interpret(verbose, stopCount, deadline)
+
+    '''
+    Returns the execCount at which execution is suspended and
+    the clock time it is suspended at, None for no deadline
+    '''
+
+    def limits(self, stepBudget, timeBudget):
+
+        stopCount = self.executionLimit if self.executionLimit != None else float('inf')
+
+        if stepBudget != None:
+            stopCount = min(stopCount, self.execCount + stepBudget)
+
+        deadline = time.perf_counter() + timeBudget if timeBudget != None else None
+
+        return stopCount, deadline
+
+    '''
+        Purpose:
+            Executes instructions one at a time from lineNum.
+
+        Parameters:
+            verbose    -  Print each line as it is executed
+            stopCount  -  execCount at which execution is suspended
+            deadline   -  Clock time at which execution is suspended,
+                          None for no deadline
+
+        Notes:
+            Superinstructions are not used in verbose mode, which
+            prints every line as it is executed.
+
+        Return:
+            FINISHED, FAILED or SUSPENDED
+    '''
+
+    def interpret(self, verbose, stopCount, deadline):
+
+        handlers = self.handlers if self.handlers != None else self.bindHandlers()
+
+        out = self.out
+
+        code = self.fused if self.fused != None and not verbose else self.code
+
+        numLines = len(code)
+
+        self.stopCount = stopCount
+
+        # execCount at which the clock is next read
+        checkCount = self.execCount
+
+        while self.lineNum <= numLines:
+
+            instr = code[self.lineNum - 1]
+
+            if self.execCount >= stopCount:
+                return Executor.SUSPENDED
+
+            # the clock is only read every TIME_CHECK_INTERVAL lines
+            if deadline != None and self.execCount >= checkCount:
+
+                if time.perf_counter() >= deadline:
+                    return Executor.SUSPENDED
+
+                checkCount = self.execCount + Executor.TIME_CHECK_INTERVAL
 
             if verbose:
-                print("Executing line %d: %s" %(self.lineNum, line))
+                out.write("Executing line %d: %s\n" %(self.lineNum, instr.text))
 
             # If the line is blank, skip it
-            if re.match('^\n$', line):
+            if instr.opcode == BLANK:
 
                 self.lineNum += 1
 
                 continue
 
-            if assignRE.match(line) != None:
+            # handler executes the instruction and advances lineNum
+            try:
+                handlers[instr.opcode](instr)
 
-                assignMO = assignRE.match(line)
+            except Exception as e:
+                self.error = str(e.args[0])
+                self.reportError(e.args[0])
 
-                varName = assignMO.group(1)
+                if self.onError != None:
+                    self.onError()
 
-                op = assignMO.group(2)
+                break
 
-                var1 = assignMO.group(3)
+            self.execCount += 1
 
-                var2 = assignMO.group(4)
+        out.write("execution ends, %d lines executed\n" % (self.execCount))
 
-                try:
-                    self.assignVar(varName, op, var1, var2)
-                except(InvalidValueType, TooFewOperands, InvalidExpression, VarNotDefined) as e:
-                    print("*** line %d error detected ***" % (self.lineNum))
-                    print("%-10s %d *** %s ***" % (" ", self.lineNum, str(e.args[0])))
-                    break
+        return Executor.FAILED if self.error != None else Executor.FINISHED
 
-                except Exception as e:
-                    print("*** line %d error detected ***" % (self.lineNum))
-                    print("%-10s %d *** %s ***" % (" ", self.lineNum, str(e.args[0])))
-                    break
+    '''
+    True if execution was suspended because executionLimit
+    lines have been executed
+    '''
 
-            elif printRE.match(line) != None:
+    def limitReached(self):
 
-                printMO = printRE.match(line)
+        return self.state == Executor.SUSPENDED and self.executionLimit != None \
+            and self.execCount >= self.executionLimit
 
-                args = printMO.group(1).split()
+    '''
+    Writes the error message for the current line
+    '''
 
-                try:
-                    self.bPrint(args)
+    def reportError(self, message):
 
-                except(VarNotDefined) as e:
-                    print("*** line %d error detected ***" % (self.lineNum))
-                    print("%-10s %d *** %s ***" % (" ", self.lineNum, str(e.args[0])))
-                    break
+        self.out.write("*** line %d error detected ***\n" % (self.lineNum))
+        self.out.write("%-10s %d *** %s ***\n" % (" ", self.lineNum, str(message)))
 
+    '''
+        Purpose:
+            Decodes the source into instructions if it has not
+            been decoded yet and loads the declared values into
+            the variable slots.
+
+        Notes:
+            Each source line is regex matched once here rather than
+            every time the line is executed. Constant expressions
+            are folded and superinstructions built, and specialized
+            to the kinds of value of their operands, and counted
+            loops summarized, for a program that is decoded in full.
+
+        Return:
+            List of decoded instructions
+    '''
 
-            elif gotoRE.match(line) != None:
+    def compile(self):
 
-                gotoMO = gotoRE.match(line)
+        if self.code == None:
+            self.code = compileSource(self.source, self.labelD, self.slotD)
 
-                label = gotoMO.group(1)
+        if self.folding and not self.folded and type(self.code) is list:
+            constD = constantSlots(self.code, self.varValueD, self.slotD)
 
-                try:
-                    self.goto(label)
+            self.code = foldConstants(self.code, constD)
 
-                    # lineNum advanced to position of label
-                    self.execCount += 1
-                    continue
+            self.folded = True
 
-                except(LabelNotDefined) as e:
-                    print("*** line %d error detected ***" % (self.lineNum))
-                    print("%-10s %d *** %s ***" % (" ", self.lineNum, str(e.args[0])))
-                    break
+            self.constSlots = frozenset(constD)
 
-            elif ifRE.match(line) != None:
+        if self.fusion and self.fused == None and type(self.code) is list:
+            self.fused = fuseBlocks(self.code)
 
-                ifMO = ifRE.match(line)
+            if self.specializing:
+                self.kindD = inferKinds(self.code, self.varValueD, self.slotD)
 
-                op  = ifMO.group(3)
+                self.fused = specializeCode(self.fused, self.kindD)
 
-                op1 = ifMO.group(4)
+            if self.summarizing:
+                self.fused = summarizeLoops(self.fused, self.code)
 
-                op2 = ifMO.group(5)
+        if self.values == None:
+            self.values = [UNDEFINED] * len(self.slotD)
+
+            for name, value in self.varValueD.items():
+                self.values[self.slotD[name]] = value
+
+            self.checkKinds()
+
+        return self.code
+
+    '''
+    Drops the specialized instructions if a variable holds a kind
+    of value they were not specialized for, as a value given from
+    outside the program, not by its declaration, can be
+    '''
 
-                label = ifMO.group(6)
+    def checkKinds(self):
 
-                try:
-                    if self.evalIf(op, op1, op2, label):
+        if self.kindD == None:
+            return
 
-                        # lineNum advanced to position of label
-                        self.execCount +=1
-                        continue
+        for slot, kinds in self.kindD.items():
 
-                except(InvalidExpression) as e:
-                    print("*** line %d error detected ***" % (self.lineNum))
-                    print("%-10s %d *** %s ***" % (" ", self.lineNum, str(e.args[0])))
-                    break
+            if valueKind(self.values[slot]) not in kinds:
+                self.fused = fuseBlocks(self.code)
+
+                if self.summarizing:
+                    self.fused = summarizeLoops(self.fused, self.code)
+
+                self.kindD = None
+
+                return
+
+    '''
+         Purpose:
+            Maps the variable slots back to variable names.
+
+        Notes:
+            Only needed when variables are dumped or returned to a
+            caller, execution reads and writes the slots directly.
+            A string held as a Rope is flattened, so no rope leaves
+            the executor.
+
+        Return:
+            Dictionary with mapping of var name to value
+    '''
+
+    def variableValues(self):
+
+        values = self.values if self.values != None else [UNDEFINED] * len(self.slotD)
+
+        varValueD = dict(self.varValueD)
+
+        for name, slot in self.slotD.items():
+
+            if slot < len(values) and values[slot] is not UNDEFINED:
+                value = values[slot]
+
+                varValueD[name] = value.flatten() if type(value) is Rope else value
+
+        return varValueD
+
+    '''
+    Returns the handlers of the executor, binding those of
+    HANDLERS to it the first time. A Profiler or Tracer replaces
+    handlers in the dictionary returned
+    '''
+
+    def bindHandlers(self):
+
+        if self.handlers == None:
+            self.handlers = {opcode: types.MethodType(handler, self) for opcode, handler in self.HANDLERS.items()}
+
+        return self.handlers
+
+    '''
+        Purpose:
+            Forks the executor.
+
+        Parameters:
+            out        -  Stream or OutputSink for the output of the
+                          fork, None to share this executor's
+            overrides  -  Dictionary of var name to value set in the
+                          fork; names are not case sensitive
+
+        Notes:
+            The fork carries on from the same line with the same
+            values, and shares the source, labels and instructions
+            with this executor. The list of variable slots is shared
+            too until either executor runs or the fork is given
+            overrides, and is then copied whole: the copy holds one
+            reference per variable, the values themselves are still
+            shared, and the interpreter and the fast tier keep
+            indexing a plain list rather than looking each slot up
+            in an overlay of written slots. Raises KeyError for a
+            variable the program neither declares nor assigns.
+            An override of a variable whose value was folded into
+            the instructions gives the fork its own instructions,
+            decoded and folded again without that variable.
+            Handlers replaced by a Profiler or Tracer are not forked.
+
+        Return:
+            Executor of the same class
+    '''
+
+    def fork(self, out=None, overrides=None):
+
+        self.compile()
+
+        fork = object.__new__(type(self))
+
+        for cls in type(self).__mro__:
+
+            for name in getattr(cls, '__slots__', ()):
+                setattr(fork, name, getattr(self, name))
+
+        fork.shared = self.shared = True
+
+        fork.handlers = None
+
+        fork.onError = None
+
+        if out != None:
+            fork.out = out
+
+        if overrides:
+            fork.values = list(self.values)
+
+            fork.shared = False
+
+            slots = set()
+
+            for name, value in overrides.items():
+                slot = self.slotD[name.upper()]
+
+                fork.values[slot] = value
+
+                slots.add(slot)
+
+            if slots & self.constSlots:
+                fork.refold(slots)
+
+            fork.checkKinds()
+
+        return fork
+
+    '''
+    Decodes and folds the source again, keeping the variables in
+    slots as variables since they no longer hold their declared value
+    '''
+
+    def refold(self, slots):
+
+        code = compileSource(self.source, self.labelD, self.slotD)
+
+        constD = {slot: value for slot, value in constantSlots(code, self.varValueD, self.slotD).items()
+                  if slot not in slots}
+
+        self.code = foldConstants(code, constD)
+
+        self.constSlots = frozenset(constD)
+
+        self.fused = None
+
+        self.kindD = None
+
+        self.compile()
+
+    '''
+    Instruction handlers, dispatched by opcode from execute.
+    Each handler executes one instruction and sets lineNum
+    to the next line to execute
+    '''
+
+    def execNop(self, instr):
+
+        self.lineNum += 1
+
+    def execAssign(self, instr):
+
+        varName, var1, var2 = instr.operands
+
+        self.assignVar(varName, instr.op, var1, var2)
+
+        self.lineNum += 1
+
+    def execPrint(self, instr):
+
+        self.bPrint(instr.operands)
+
+        self.lineNum += 1
+
+    def execGoto(self, instr):
+
+        # lineNum advanced to position of label
+        self.goto(instr.label, instr.target)
+
+    def execIf(self, instr):
+
+        op1, op2 = instr.operands
+
+        # lineNum advanced to position of label if expression is true
+        if not self.evalIf(instr.op, op1, op2, instr.label, instr.target):
+            self.lineNum += 1
+
+    '''
+    Executes the lines of a superinstruction while control passes
+    from one to the next, counting all but the last as executed.
+    It stops early rather than execute a line at stopCount
+    '''
+
+    def execFused(self, instr):
+
+        handlers = self.handlers
+
+        first = instr.first
+
+        handlers[first.opcode](first)
+
+        for entry, part in instr.parts:
+
+            if self.lineNum != entry or self.execCount + 1 >= self.stopCount:
+                return
 
             self.execCount += 1
 
+            self.lineNum = part.lineNum
+
+            handlers[part.opcode](part)
+
+    '''
+    Handlers of the specialized instructions, whose operands are
+    known to be of the right kind, so they are neither checked nor
+    converted
+    '''
+
+    def execIntAdd(self, instr):
+
+        values = self.values
+
+        values[instr.slot] = values[instr.values[0][0]] + instr.amount
+
+        self.lineNum += 1
+
+    def execIntIf(self, instr):
+
+        values = self.values
+
+        (slot1, const1), (slot2, const2) = instr.values
+
+        if instr.compare(values[slot1] if slot1 != None else const1, values[slot2] if slot2 != None else const2):
+            self.lineNum = instr.target
+
+        else:
             self.lineNum += 1
 
-        print("execution ends, %d lines executed" % (self.execCount))
+    def execConcat(self, instr):
+
+        values = self.values
+
+        (slot1, const1), (slot2, const2) = instr.values
+
+        values[instr.slot] = concatValues(values[slot1] if slot1 != None else const1,
+                                          values[slot2] if slot2 != None else const2)
+
+        self.lineNum += 1
+
+    def execRepeat(self, instr):
+
+        values = self.values
+
+        (slot1, const1), (slot2, const2) = instr.values
+
+        values[instr.slot] = repeatValue(values[slot1] if slot1 != None else const1,
+                                         values[slot2] if slot2 != None else const2)
+
+        self.lineNum += 1
+
+    '''
+    Executes the IF of a summarized loop after making every
+    trip round the loop that can be made at once
+    '''
+
+    def execLoop(self, instr):
+
+        trips = self.loopTrips(instr)
+
+        if trips > 0:
+            self.skipTrips(instr, trips)
+
+        header = instr.header
+
+        self.handlers[header.opcode](header)
+
+    '''
+        Purpose:
+            Counts the trips a summarized loop can make at once.
+
+        Parameters:
+            loop  -  LoopSummary of the loop
+
+        Notes:
+            The trips stop short of stopCount so that the IF is
+            executed after them, and the lines of a trip that would
+            reach stopCount are executed one at a time. Induction
+            variables must hold ints; an operand of the IF that does
+            not change must convert to one.
+
+        Return:
+            Number of trips, 0 if the loop is stepped
+    '''
+
+    def loopTrips(self, loop):
+
+        values = self.values
+
+        steps = loop.steps
+
+        for slot in steps:
+
+            if type(values[slot]) is not int:
+                return 0
+
+        try:
+            val1, val2 = [values[arg.slot] if arg.slot in steps else self.toInt(self.evalSymbol(arg))
+                          for arg in loop.operands]
+
+        except Exception:
+            return 0
+
+        trips = tripCount(loop.op, loop.branches, val1 - val2,
+                          steps.get(loop.operands[0].slot, 0) - steps.get(loop.operands[1].slot, 0))
+
+        if self.stopCount != float('inf'):
+            room = (self.stopCount - self.execCount - 1) // loop.count
+
+            trips = room if trips == None else min(trips, room)
+
+        return trips if trips != None else 0
+
+    '''
+        Purpose:
+            Makes trips round a summarized loop at once.
+
+        Parameters:
+            loop   -  LoopSummary of the loop
+            trips  -  Number of trips, none of which reaches stopCount
+
+        Notes:
+            The effects of one trip are evaluated in order first; if
+            any of them raises, the variables are restored and the
+            loop is stepped, so the error is reported on its line.
+            Otherwise every ASSIGN already holds its value, induction
+            variables and grown strings are moved on by all the
+            trips, and the PRINTs of every trip are written.
+
+        Return:
+            Void
+    '''
+
+    def skipTrips(self, loop, trips):
+
+        values = self.values
+
+        saved = []      # (slot, value) of the variables assigned, to restore
+
+        grown = []      # (effect, slot, piece) of the strings grown
+
+        printed = []    # parts of each PRINT, a str or (slot, value added)
+
+        try:
+
+            for effect in loop.effects:
+
+                if effect[0] == ASSIGN:
+                    instr = effect[1]
+
+                    slot = instr.operands[0].slot
+
+                    value = self.loopValue(instr)
+
+                    saved.append((slot, values[slot]))
+
+                    values[slot] = value
+
+                elif effect[0] in (APPEND, PREPEND):
+                    kind, slot, arg = effect
+
+                    value = values[slot]
+
+                    piece = self.evalSymbol(arg)
+
+                    if not (type(value) in (str, Rope) and type(piece) in (str, Rope)
+                            or type(value) is int and type(piece) is int):
+                        raise InvalidValueType("%s cannot be joined to %s" % (arg.text, value))
+
+                    grown.append((kind, slot, piece))
+
+                else:
+                    parts = []
+
+                    for arg, slot, offset in effect[1]:
+
+                        if slot != None:
+                            parts.append((slot, offset))
+
+                            continue
+
+                        val = self.evalSymbol(arg)
+
+                        if val == None:
+                            raise InvalidValueType("%s is not a variable, numeric constant, or string constant" %(arg.text))
+
+                        parts.append(str(val))
+
+                    printed.append(parts)
+
+        except Exception:
+
+            for slot, value in reversed(saved):
+                values[slot] = value
+
+            return
+
+        if printed:
+            self.printTrips(printed, loop.steps, trips)
+
+        for kind, slot, piece in grown:
+            value = values[slot]
+
+            if type(value) is int:
+                values[slot] = value + piece * trips
+
+            elif kind == APPEND:
+                values[slot] = concatValues(value, repeatValue(piece, trips))
+
+            else:
+                values[slot] = concatValues(repeatValue(piece, trips), value)
+
+        for slot, step in loop.steps.items():
+            values[slot] += step * trips
+
+        self.execCount += trips * loop.count
+
+    '''
+    Evaluates the value an ASSIGN of a summarized loop gives its
+    variable on every trip, raising where assignVar would
+    '''
+
+    def loopValue(self, instr):
+
+        varName, var1, var2 = instr.operands
+
+        if instr.op == None:
+            value = self.evalSymbol(var1)
+
+            if value == None:
+                raise VarNotDefined("%s is not defined" % (var1.text))
 
+            return value
+
+        # concatenation writes an error for a missing operand, it is not evaluated here
+        if instr.op == '&' and (self.evalSymbol(var1) == None or self.evalSymbol(var2) == None):
+            raise TooFewOperands("Concatenation operation expects two operands")
+
+        return self.ASSIGN_OPS[instr.op](self, var1, var2)
+
+    '''
+        Purpose:
+            Writes the PRINTs of the trips of a summarized loop.
+
+        Parameters:
+            printed  -  Parts of each PRINT of a trip, a str or the
+                        slot of an induction variable and the amount
+                        it has changed by when the PRINT runs
+            steps    -  Dictionary of induction variable slot to the
+                        amount added each trip
+            trips    -  Number of trips
+
+        Notes:
+            The lines of PRINT_TRIPS trips are written at a time,
+            as bPrint writes them.
+
+        Return:
+            Void
+    '''
+
+    def printTrips(self, printed, steps, trips):
+
+        values = self.values
+
+        lines = [" ".join(parts + ["\n"]) for parts in printed if all(type(part) is str for part in parts)]
+
+        # every trip prints the same lines
+        if len(lines) == len(printed):
+            text = "".join(lines)
+
+            for done in range(0, trips, Executor.PRINT_TRIPS):
+                self.out.write(text * min(Executor.PRINT_TRIPS, trips - done))
+
+            return
+
+        for done in range(0, trips, Executor.PRINT_TRIPS):
+            text = []
+
+            for trip in range(done, min(done + Executor.PRINT_TRIPS, trips)):
+
+                for parts in printed:
+                    text.append(" ".join([part if type(part) is str
+                                          else str(values[part[0]] + steps[part[0]] * trip + part[1])
+                                          for part in parts] + ["\n"]))
+
+            self.out.write("".join(text))
 
     '''
          Purpose: 
@@ -182,78 +857,79 @@ class Executor:
 
     def assignVar(self, varName, op, var1, var2):
 
-        varName = varName.upper()
-
         # expression is a varLiteral
         if op == None and var1 != None and var2 == None:
 
-            try:
-                # obtain the value of the varLiteral
-                val1 = self.evalSymbol(var1)
-
-                if val1 != None:
-                    self.varValueD[varName] = val1
-
-                # var1 is not a string or int constant or declared variable
-                else:
-                    raise VarNotDefined("%s is not defined" % (var1))
+            # obtain the value of the varLiteral
+            val1 = self.evalSymbol(var1)
 
-            except (VarNotDefined) as e:
-                raise e
+            if val1 != None:
+                self.values[varName.slot] = val1
 
-            # key not found error
-            except (KeyError) as e:
-                raise VarNotDefined("%s is not defined" %(varName))
+            # var1 is not a string or int constant or declared variable
+            else:
+                raise VarNotDefined("%s is not defined" % (var1.text))
 
         # expression has an operator
         elif op != None and var1 != None and var2 != None:
 
-            if op == '*':
-                try:
-                    self.varValueD[varName] = self.replicate(var1, var2)
+            operation = self.ASSIGN_OPS.get(op, None)
 
-                except(TooFewOperands) as e:
-                    raise e
+            if operation == None:
+                raise InvalidExpression("%s is not a valid operator" % (op))
 
+            self.values[varName.slot] = operation(self, var1, var2)
 
-            elif op == '+':
-                self.varValueD[varName] = self.varValueD[var1.upper()] + int(var2)
+        else:
+            raise TooFewOperands("An operator and two operands are required for this operation")
 
-            elif op == '-':
-                self.varValueD[varName] = self.varValueD[var1.upper()] - int(var2)
 
-            elif op == '>':
+    '''
+    Adds an integer constant to the value of variable var1
+    '''
 
-                try:
-                    self.varValueD[varName] = self.evalGreater(var1, var2)
+    def add(self, var1, var2):
 
-                except(InvalidValueType) as e:
-                    raise e
+        return self.readVar(var1) + (var2.const if var2.const != None else int(var2.text))
 
-            elif op == '>=':
+    '''
+    Subtracts an integer constant from the value of variable var1
+    '''
 
-                try:
-                    self.varValueD[varName] = self.evalGreater(var1, var2, True)
+    def subtract(self, var1, var2):
 
-                except(InvalidValueType) as e:
-                    raise e
+        return self.readVar(var1) - (var2.const if var2.const != None else int(var2.text))
 
-            elif op == '&':
+    '''
+    Returns the value of variable operand var, raising
+    KeyError if the variable has never been assigned
+    '''
 
-                try:
-                    self.varValueD[varName] = self.concat(var1, var2)
+    def readVar(self, var):
 
-                except(TooFewOperands) as e:
-                    print("*** line %d error detected ***" % (self.lineNum))
-                    print("%-10s %d *** %s ***" % (" ", self.lineNum, str(e.args[1])))
-                    raise e
-                
-            else:
-                raise InvalidExpression("%s is not a valid operator" % (op))
+        val = self.values[var.slot]
 
-        else:
-            raise TooFewOperands("An operator and two operands are required for this operation")
+        if val is UNDEFINED:
+            raise KeyError(var.text.upper())
 
+        return val
+
+    '''
+    Comparisons for ASSIGN compare the operand tokens
+    themselves rather than their values
+    '''
+
+    def assignGreater(self, var1, var2):
+
+        return self.evalGreater(self.tokenValue(var1), self.tokenValue(var2))
+
+    def assignGreaterEqual(self, var1, var2):
+
+        return self.evalGreater(self.tokenValue(var1), self.tokenValue(var2), True)
+
+    def tokenValue(self, var):
+
+        return var.const if var.const != None else var.text
 
     '''
          Purpose: 
@@ -278,7 +954,7 @@ class Executor:
         val2 = self.evalSymbol(var2)
 
         if val1 != None and val2 != None:
-            return val1 * int(val2)
+            return repeatValue(val1, val2 if type(val2) is int else int(val2))
 
         else:
             raise TooFewOperands("Replication operation expects two operands")
@@ -301,14 +977,9 @@ class Executor:
 
     def evalGreater(self, var1, var2, equal=False):
 
-        try:
-            iVal1 = int(var1)
-        except:
-            raise InvalidValueType("'%s' is not numeric" % (var1))
-        try:
-            iVal2 = int(var2)
-        except:
-            raise InvalidValueType("'%s' is not numeric" % (var2))
+        iVal1 = self.toInt(var1)
+
+        iVal2 = self.toInt(var2)
 
         return iVal1 > iVal2 if not equal else iVal1 >= iVal2
 
@@ -330,16 +1001,39 @@ class Executor:
 
     def evalLess(self, var1, var2, equal=False):
 
+        iVal1 = self.toInt(var1)
+
+        iVal2 = self.toInt(var2)
+
+        return iVal1 < iVal2 if not equal else iVal1 <= iVal2
+
+    '''
+    Returns val as an int, converting it only if
+    it is not an int already
+    '''
+
+    def toInt(self, val):
+
+        if type(val) is int:
+            return val
+
         try:
-            iVal1 = int(var1)
-        except:
-            raise InvalidValueType("'%s' is not numeric" % (var1))
-        try:
-            iVal2 = int(var2)
+            return int(val)
         except:
-            raise InvalidValueType("'%s' is not numeric" % (var2))
+            raise InvalidValueType("'%s' is not numeric" % (val))
 
-        return iVal1 < iVal2 if not equal else iVal1 <= iVal2
+    '''
+    Comparisons with equality, used by the ASSIGN and IF
+    operator tables
+    '''
+
+    def evalGreaterEqual(self, var1, var2):
+
+        return self.evalGreater(var1, var2, True)
+
+    def evalLessEqual(self, var1, var2):
+
+        return self.evalLess(var1, var2, True)
 
     '''
          Purpose: 
@@ -363,11 +1057,25 @@ class Executor:
         val2 = self.evalSymbol(var2)
 
         if val1 != None and val2 != None:
-            return val1 + val2
+            return concatValues(val1, val2)
 
         else:
             raise TooFewOperands("Concatenation operation expects two operands")
 
+    '''
+    Concatenation for ASSIGN, reports missing operands
+    before the error is raised to execute
+    '''
+
+    def assignConcat(self, var1, var2):
+
+        try:
+            return self.concat(var1, var2)
+
+        except(TooFewOperands) as e:
+            self.reportError(e.args[1])
+            raise e
+
     '''
          Purpose: 
             Evaluates the expression of an if statement.
@@ -379,6 +1087,7 @@ class Executor:
             op1 -  First Operand
             op2 -  Second Operand
             label - Label to branch to if expression is true
+            target - Line number of label, if already resolved
     
         Notes:
             expression has the form:
@@ -393,7 +1102,7 @@ class Executor:
             has been branched to position of label, False otherwise.
     '''
 
-    def evalIf(self, op, op1, op2, label):
+    def evalIf(self, op, op1, op2, label, target=None):
 
         val1 = self.evalSymbol(op1)
 
@@ -401,22 +1110,12 @@ class Executor:
 
         evaluated = False
 
-        try:
-
-            if op == '>' and self.evalGreater(val1, val2):
-                self.goto(label)
-                evaluated = True
-
-            elif op == '>=' and self.evalGreater(val1, val2, True):
-                self.goto(label)
-                evaluated = True
+        compare = self.COMPARE_OPS.get(op, None)
 
-            elif op == '<' and self.evalLess(val1, val2):
-                self.goto(label)
-                evaluated = True
+        try:
 
-            elif op == '<=' and self.evalLess(val1, val2, True):
-                self.goto(label)
+            if compare != None and compare(self, val1, val2):
+                self.goto(label, target)
                 evaluated = True
 
         except (InvalidValueType) as e:
@@ -435,13 +1134,14 @@ class Executor:
             Evaluates the value of a symbol.
             
          Parameters:
-            symbol -  variable, numeric constant, or string constant to parse
+            symbol -  Operand for a variable, numeric constant, or string constant
          
          Notes:
-            Assumed that var is in same format as in the BEEP source file.
-            If symbol is a variable, upper() used to obtain key for relative value 
+            If symbol is a variable, its value is read from the variable's slot
             If symbol is a string constant, contents within quotes " " is returned
             If symbol is a numeric constant, parsed integer is returned
+            A variable without a value is evaluated as a constant.
+            Constants are parsed when the source is compiled
             
          Return:
          
@@ -450,42 +1150,39 @@ class Executor:
     '''
     def evalSymbol(self, symbol):
 
-        stringRE = re.compile(r'"(.*)"')
-        intRE = re.compile(r'^\d+$')
-
         # check if varLiteral is a variable
-        if self.varValueD.get(symbol.upper(), None) != None:
-            return self.varValueD[symbol.upper()]
-
-        # Var Literal is String
-        elif stringRE.match(symbol) != None:
-            return stringRE.match(symbol).group(1)
+        if symbol.slot != None:
+            val = self.values[symbol.slot]
 
-        # Var Literal is an Int
-        elif intRE.match(symbol) != None:
-            return intRE.match(symbol).group()
+            if val != None and val is not UNDEFINED:
+                return val
 
-        else:
-            return None
+        # string or numeric constant parsed at compile time
+        return symbol.const
 
     '''
-    Sets the BEEP source line to execute
+    Sets the BEEP source line to execute.
+    target is the line number of label when it
+    was resolved at compile time
     '''
-    def goto(self, label):
+    def goto(self, label, target=None):
 
-        l = label.upper()
+        if target == None:
+            target = self.labelD.get(label.upper(), None)
 
-        if self.labelD.get(l, None) == None:
+        if target == None:
             raise LabelNotDefined("Label %s is not defined" %(label))
 
         else:
-            self.lineNum = self.labelD[l]
+            self.lineNum = target
 
     '''
-    
+    Prints the values of the PRINT arguments on one line
     '''
     def bPrint(self, args):
 
+        line = []
+
         # iterate over arguments to print
         for arg in args:
 
@@ -493,11 +1190,26 @@ class Executor:
 
             # value is not a string const, numeric const, or variable
             if val == None:
-                raise InvalidValueType("%s is not a variable, numeric constant, or string constant" %(arg))
+                raise InvalidValueType("%s is not a variable, numeric constant, or string constant" %(arg.text))
+
+            line.append(str(val))
+
+        # one write for the whole line, arguments separated as print did
+        line.append("\n")
+
+        self.out.write(" ".join(line))
+
+    # instruction handlers by opcode, bound to an executor when it first runs
+    HANDLERS = {NOP: execNop, ASSIGN: execAssign, PRINT: execPrint, GOTO: execGoto, IF: execIf,
+                FUSED: execFused, INT_ADD: execIntAdd, INT_IF: execIntIf,
+                STR_CONCAT: execConcat, STR_REPEAT: execRepeat, LOOP: execLoop}
 
-            print(val, end=" ")
+    # ASSIGN operations by operator, called with the executor and both operands
+    ASSIGN_OPS = {'*': replicate, '+': add, '-': subtract,
+                  '>': assignGreater, '>=': assignGreaterEqual, '&': assignConcat}
 
-        print("")
+    # IF comparisons by operator, called with the executor and both operand values
+    COMPARE_OPS = {'>': evalGreater, '>=': evalGreaterEqual, '<': evalLess, '<=': evalLessEqual}
 
 
 
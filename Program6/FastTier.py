@@ -0,0 +1,484 @@
+from Executor import Executor, UNDEFINED
+from Rope import concatValues, repeatValue
+from Compiler import BLANK, NOP, ASSIGN, PRINT, GOTO, IF
+from ControlFlow import buildBlocks, BRANCH_OPS
+import time
+
+'''
+Responsible for the fast execution tier. Once a program has run
+for a while it is translated into a single generated Python
+function: each basic block becomes straight-line Python, GOTO and
+IF become direct jumps between blocks and variables become locals
+of the function. Lines the translation does not handle, and lines
+that raise, are handed back to the interpreter, so output, error
+messages and the executed-lines count are the same in both tiers.
+'''
+
+# reasons the translated program returns
+END   = 'end'       # ran past the last line of the source
+LIMIT = 'limit'     # the next block would reach the line limit
+DEOPT = 'deopt'     # a line raised or is not translated, the interpreter executes it
+
+class Deoptimize(Exception):
+    pass
+
+
+'''
+Raises Deoptimize, generated for lines that are
+always left to the interpreter
+'''
+def deopt():
+
+    raise Deoptimize()
+
+
+class Translator:
+
+    '''
+    Constructor for Translator
+    '''
+
+    def __init__(self, code):
+
+        self.code = code                        # decoded instructions, one per source line
+
+        # dictionary of block start line to execution count, a block starts where a line is branched to
+        self.blockD = {start: block.count() for start, block in buildBlocks(code).items()}
+
+        self.slots = set()                      # slots used by the program, held in locals
+
+        self.lines = []                         # generated source lines
+
+        self.lineD = {}                         # dictionary of generated line number to (line, lines executed before it in its block)
+
+    '''
+    Expression for the value of an operand, as evalSymbol reads it.
+    If required, an operand without a value deoptimizes
+    '''
+
+    def value(self, operand, required=False):
+
+        missing = "deopt()" if required else "None"
+
+        if operand.slot == None:
+            return repr(operand.const) if operand.const != None else missing
+
+        self.slots.add(operand.slot)
+
+        var = "v%d" % (operand.slot)
+
+        fallback = repr(operand.const) if operand.const != None else missing
+
+        if fallback == "None":
+            return "(None if %s is U else %s)" % (var, var)
+
+        return "(%s if %s is not None and %s is not U else %s)" % (var, var, var, fallback)
+
+    '''
+    Expression for the value of an operand converted to an int
+    '''
+
+    def intValue(self, operand):
+
+        if operand.slot == None:
+            return repr(operand.const) if type(operand.const) is int else "int(%s)" % (self.value(operand, True))
+
+        var = "v%d" % (operand.slot)
+
+        return "(%s if type(%s) is int else int(%s))" % (var, var, self.value(operand, True))
+
+    '''
+        Purpose:
+            Translates one instruction.
+
+        Notes:
+            The statement is the Python for the instruction, it is
+            None for a line that only counts as executed. A
+            translated line has no effect until it has evaluated
+            everything that can raise, so a line that raises can
+            be executed again by the interpreter.
+
+        Return:
+            Tuple of the statement and the line branched to, None
+            if the instruction does not branch
+    '''
+
+    def translateLine(self, instr):
+
+        if instr.opcode == NOP:
+            return None, None
+
+        if instr.opcode == ASSIGN:
+            return self.translateAssign(instr), None
+
+        if instr.opcode == PRINT:
+            return self.translatePrint(instr), None
+
+        if instr.opcode == GOTO:
+
+            if instr.target == None:
+                return "deopt()", None
+
+            return None, instr.target
+
+        if instr.op not in BRANCH_OPS:
+            return None, None
+
+        op1, op2 = instr.operands
+
+        condition = "%s %s %s" % (self.intValue(op1), instr.op, self.intValue(op2))
+
+        if instr.target == None:
+            return "if %s: deopt()" % (condition), None
+
+        return "if %s:" % (condition), instr.target
+
+    def translateAssign(self, instr):
+
+        varName, var1, var2 = instr.operands
+
+        op = instr.op
+
+        self.slots.add(varName.slot)
+
+        target = "v%d = " % (varName.slot)
+
+        if op == None and var2 == None:
+            return target + self.value(var1, True)
+
+        if op == None or var2 == None:
+            return "deopt()"
+
+        if op in ('+', '-'):
+            self.slots.add(var1.slot)
+
+            amount = repr(var2.const) if var2.const != None else "int(%r)" % (var2.text)
+
+            return target + "v%d %s %s" % (var1.slot, op, amount)
+
+        if op == '*':
+            return target + "repeatValue(%s, int(%s))" % (self.value(var1, True), self.value(var2, True))
+
+        if op == '&':
+            return target + "concatValues(%s, %s)" % (self.value(var1, True), self.value(var2, True))
+
+        # comparisons of the tokens themselves are constant
+        if op in ('>', '>='):
+
+            try:
+                val1 = self.tokenInt(var1)
+
+                val2 = self.tokenInt(var2)
+
+            except Exception:
+                return "deopt()"
+
+            return target + repr(val1 > val2 if op == '>' else val1 >= val2)
+
+        return "deopt()"
+
+    def tokenInt(self, var):
+
+        val = var.const if var.const != None else var.text
+
+        return val if type(val) is int else int(val)
+
+    def translatePrint(self, instr):
+
+        terms = []      # expressions added together for the line
+
+        text = ""       # constant text not yet in terms, joined when translating
+
+        for arg in instr.operands:
+
+            if arg.slot == None:
+
+                if arg.const == None:
+                    return "deopt()"
+
+                text += str(arg.const) + " "
+
+            else:
+
+                if text:
+                    terms.append(repr(text))
+
+                terms.append("str(%s)" % (self.value(arg, True)))
+
+                text = " "
+
+        terms.append(repr(text + "\n"))
+
+        return "write(%s)" % (" + ".join(terms))
+
+    def emit(self, indent, text, lineNum=None, before=0):
+
+        self.lines.append("    " * indent + text)
+
+        if lineNum != None:
+            self.lineD[len(self.lines)] = (lineNum, before)
+
+    '''
+        Purpose:
+            Generates the Python source of the program function.
+
+        Notes:
+            The function is called with the variable slots, the
+            execution count, the block to start at, the execution
+            count no block may reach and the output write function.
+            Blocks are tested in line order, so falling through to
+            the next block or jumping forward does not go back to
+            the top of the loop.
+
+        Return:
+            Python source as a string
+    '''
+
+    def generate(self):
+
+        body = []
+
+        self.lines = body
+
+        numLines = len(self.code)
+
+        for start in sorted(self.blockD):
+
+            count = self.blockD[start]
+
+            self.emit(2, "if pc == %d:" % (start))
+
+            self.emit(3, "if n + %d >= lim:" % (count))
+
+            self.emit(4, "reason = LIMIT")
+
+            self.emit(4, "break")
+
+            before = 0
+
+            lineNum = start
+
+            target = None
+
+            while lineNum <= numLines:
+
+                instr = self.code[lineNum - 1]
+
+                if instr.opcode != BLANK:
+                    statement, target = self.translateLine(instr)
+
+                    if statement != None:
+                        self.emit(3, statement, lineNum, before)
+
+                    before += 1
+
+                lineNum += 1
+
+                if target != None or lineNum in self.blockD:
+                    break
+
+            indent = 3
+
+            if target != None:
+
+                if instr.opcode == IF:
+                    indent = 4
+
+                self.emit(indent, "n += %d" % (count))
+
+                self.emit(indent, "pc = %d" % (target))
+
+                # forward jumps fall through to the test of the target block
+                if target <= start:
+                    self.emit(indent, "continue")
+
+                if instr.opcode == GOTO:
+                    continue
+
+                self.emit(3, "else:")
+
+            self.emit(indent, "n += %d" % (count))
+
+            self.emit(indent, "pc = %d" % (lineNum))
+
+        slots = "".join("v%d, " % (slot) for slot in sorted(self.slots))
+
+        self.lines = []
+
+        self.emit(0, "def program(values, n, pc, lim, write):")
+
+        if slots:
+            self.emit(1, "%s= %s" % (slots, "".join("values[%d], " % (slot) for slot in sorted(self.slots))))
+
+        self.emit(1, "reason = END")
+
+        self.emit(1, "try:")
+
+        self.emit(2, "while True:")
+
+        offset = len(self.lines)
+
+        self.lineD = {line + offset: entry for line, entry in self.lineD.items()}
+
+        self.lines.extend("    " + text for text in body)
+
+        self.emit(3, "if pc > %d:" % (numLines))
+
+        self.emit(4, "break")
+
+        self.emit(1, "except Exception as e:")
+
+        self.emit(2, "pc, before = lineD[e.__traceback__.tb_lineno]")
+
+        self.emit(2, "n += before")
+
+        self.emit(2, "reason = DEOPT")
+
+        for slot in sorted(self.slots):
+            self.emit(1, "values[%d] = v%d" % (slot, slot))
+
+        self.emit(1, "return reason, pc, n")
+
+        return "\n".join(self.lines) + "\n"
+
+    '''
+    Compiles the generated source and returns the program function
+    '''
+
+    def translate(self):
+
+        source = self.generate()
+
+        namespace = {"U": UNDEFINED, "END": END, "LIMIT": LIMIT, "DEOPT": DEOPT, "lineD": self.lineD,
+                     "deopt": deopt,
+                     "repeatValue": repeatValue, "concatValues": concatValues}
+
+        exec(compile(source, "<BEEP program>", "exec"), namespace)
+
+        return namespace["program"]
+
+
+class FastExecutor(Executor):
+
+    HOT_THRESHOLD = 1000    # lines interpreted before the program is translated
+
+    HOT_LINES_PER_LINE = 2  # lines interpreted per source line, so a long program is only translated when it loops
+
+    __slots__ = ('hotThreshold', 'program', 'blockD')
+
+    '''
+    Constructor for FastExecutor
+    '''
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+
+        self.hotThreshold = None    # lines interpreted before translating, None to size it to the program
+
+        self.program = None         # translated program function, None until translated
+
+        self.blockD = None          # dictionary of block start line to execution count
+
+    '''
+        Purpose:
+            Executes the program, in the fast tier once it is hot.
+
+        Parameters:
+            verbose     -  Print each line as it is executed
+            stepBudget  -  Lines this call may execute, None for no budget
+            timeBudget  -  Seconds this call may run, None for no budget
+
+        Notes:
+            Verbose execution and programs decoded lazily are always
+            interpreted. The translated program is entered only at the
+            start of a block; lines before the next block, lines that
+            deoptimize and the last lines before stopCount are run by
+            the interpreter, so execution suspends at the same line
+            in either tier. Handlers replaced after the executor is
+            built, as the Profiler does, are not used by the fast tier.
+
+        Return:
+            FINISHED, FAILED or SUSPENDED
+    '''
+
+    def run(self, verbose, stepBudget, timeBudget):
+
+        if verbose or type(self.code) is not list:
+            return Executor.run(self, verbose, stepBudget, timeBudget)
+
+        stopCount, deadline = self.limits(stepBudget, timeBudget)
+
+        if self.program == None:
+
+            hotCount = self.hotThreshold
+
+            if hotCount == None:
+                hotCount = max(FastExecutor.HOT_THRESHOLD, FastExecutor.HOT_LINES_PER_LINE * len(self.code))
+
+            if self.execCount < hotCount:
+                state = self.interpret(False, min(stopCount, hotCount), deadline)
+
+                if state != Executor.SUSPENDED or self.execCount < hotCount or self.execCount >= stopCount:
+                    return state
+
+            translator = Translator(self.code)
+
+            self.program = translator.translate()
+
+            self.blockD = translator.blockD
+
+        blockD = self.blockD
+
+        while True:
+
+            # the interpreter runs the lines up to the next block
+            if self.lineNum not in blockD:
+                state = self.interpret(False, min(stopCount, self.execCount + 1), None)
+
+                if state != Executor.SUSPENDED or self.execCount >= stopCount:
+                    return state
+
+                continue
+
+            count = blockD[self.lineNum]
+
+            limit = stopCount
+
+            if deadline != None:
+
+                if time.perf_counter() >= deadline:
+                    return Executor.SUSPENDED
+
+                limit = min(stopCount, self.execCount + max(Executor.TIME_CHECK_INTERVAL, count + 1))
+
+            reason, self.lineNum, self.execCount = self.program(self.values, self.execCount, self.lineNum,
+                                                                limit, self.out.write)
+
+            if reason == END:
+                self.out.write("execution ends, %d lines executed\n" % (self.execCount))
+
+                return Executor.FINISHED
+
+            if reason == DEOPT:
+                state = self.interpret(False, min(stopCount, self.execCount + 1), None)
+
+                if state != Executor.SUSPENDED or self.execCount >= stopCount:
+                    return state
+
+            # the block would reach stopCount, the interpreter stops at the same line
+            elif self.execCount + blockD[self.lineNum] >= stopCount:
+                return self.interpret(False, stopCount, deadline)
+
+    '''
+    Decodes and folds the source again, and drops the translated
+    program, which has the old constants in its source
+    '''
+
+    def refold(self, slots):
+
+        Executor.refold(self, slots)
+
+        self.program = None
+
+        self.blockD = None
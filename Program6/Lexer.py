@@ -0,0 +1,60 @@
+import re
+
+'''
+Responsible for classifying every line of BEEP source in a single
+pass. One combined expression finds the label a line defines, the
+variable it declares and the statement it holds, so the loader's
+label and VAR tables and the Compiler's instructions are built from
+the same match instead of each matching the line again.
+
+The token of a line is its match of lineRE:
+
+    token.lastgroup       -  opcode of the statement on the line
+    token.group('label')  -  label the line defines, None if none
+    token.string          -  source line as it appears in the file
+'''
+
+# One match per line. The lookaheads capture a declaration and a
+# label without consuming anything; the statement alternatives are
+# tried in order, exactly as the statement expressions were tried one
+# after another, and the empty NOP alternative always matches. The
+# declaration is groups 1 to 3 so the token can be given to declareVar,
+# and each statement group is named after the opcode it decodes to.
+lineRE = re.compile(r'''
+    (?:(?=VAR\s([\w]+)\s([\w]+)\s"?(.*?)"?$))?
+    (?:(?=\s*(?P<label>\w+):))?
+    (?:
+        (?P<BLANK>\n$)
+      | (?P<ASSIGN>\s*ASSIGN\s+(?P<target>\w+)\s+(?P<assignOp>[+\-*&>=<%]+)?\s*(?P<arg1>\w+)\s*(?P<arg2>\w+)?$)
+      | (?P<PRINT>\s*[\w:]*\s*PRINT\s+(?P<items>.*)$)
+      | (?P<GOTO>\s*[\w:]*\s*GOTO\s+(?P<gotoLabel>\w+)$)
+      | (?P<IF>\s*[\w\W]*[Ii][fF]\s+(?P<ifOp>[><=]+)\s+(?P<ifArg1>\w+)\s(?P<ifArg2>\w+)\s(?P<ifLabel>\w+)$)
+      | (?P<NOP>)
+    )''', re.VERBOSE)
+
+scanLine = lineRE.match
+
+
+'''
+    Purpose:
+        Classifies every line of BEEP source.
+
+    Parameters:
+        lines  -  List of source lines, each ending with its newline
+                  but the last
+
+    Return:
+        List of tokens, the token for line n at index n - 1
+'''
+def tokenize(lines):
+
+    return list(map(lineRE.match, lines))
+
+
+'''
+Returns True if the line of token declares a variable; a line
+that declares one never defines a label
+'''
+def declares(token):
+
+    return token.group(2) != None
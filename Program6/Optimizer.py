@@ -0,0 +1,197 @@
+from Compiler import Instruction, Operand, NOP, ASSIGN, GOTO, IF
+from ControlFlow import BRANCH_OPS
+from Rope import concatValues, repeatValue
+
+'''
+Responsible for folding constant expressions at load time. An
+ASSIGN whose operands are all constants becomes an ASSIGN of its
+result and an IF that is always true or always false becomes a
+GOTO or a NOP. A variable declared with VAR and never the target
+of an ASSIGN keeps its declared value, so it is folded as a constant.
+'''
+
+
+'''
+    Purpose:
+        Finds the variables whose value never changes.
+
+    Parameters:
+        code       -  List of Instruction, one per source line
+        varValueD  -  Dictionary with mapping of var name to declared value
+        slotD      -  Dictionary with mapping of var name to slot
+
+    Return:
+        Dictionary with mapping of slot to value
+'''
+def constantSlots(code, varValueD, slotD):
+
+    assigned = {instr.operands[0].slot for instr in code if instr.opcode == ASSIGN}
+
+    return {slotD[name]: value for name, value in varValueD.items() if slotD[name] not in assigned}
+
+
+'''
+    Purpose:
+        Folds the constant expressions of a program.
+
+    Parameters:
+        code    -  List of Instruction, one per source line
+        constD  -  Dictionary with mapping of slot to value of the
+                   variables that are never assigned
+
+    Notes:
+        A folded line is still one line, so the count of lines
+        executed does not change. An expression is only folded if
+        evaluating it succeeds; one that fails is left to fail when
+        it is executed, with the same error. An IF to an undefined
+        label is never folded, so the label is still reported.
+
+    Return:
+        List of Instruction, one per source line
+'''
+def foldConstants(code, constD):
+
+    folded = []
+
+    for instr in code:
+
+        if instr.opcode == ASSIGN:
+            instr = foldAssign(instr, constD)
+
+        elif instr.opcode == IF:
+            instr = foldIf(instr, constD)
+
+        elif instr.opcode != GOTO and instr.operands:
+            instr = withOperands(instr, tuple(foldOperand(arg, constD) for arg in instr.operands))
+
+        folded.append(instr)
+
+    return folded
+
+
+'''
+Returns a copy of instr with the given operands
+'''
+def withOperands(instr, operands):
+
+    return Instruction(instr.opcode, instr.lineNum, instr.text, instr.op, operands, instr.label, instr.target)
+
+
+'''
+Returns an ASSIGN of the constant result to the target of instr
+'''
+def assignConstant(instr, text, result):
+
+    return Instruction(ASSIGN, instr.lineNum, instr.text, operands=(instr.operands[0], Operand(text, None, result), None))
+
+
+'''
+Replaces an operand for a variable that never changes with its
+value, as evalSymbol would read it
+'''
+def foldOperand(operand, constD):
+
+    if operand == None or operand.slot not in constD:
+        return operand
+
+    value = constD[operand.slot]
+
+    return Operand(operand.text, None, value if value != None else operand.const)
+
+
+'''
+Returns the value of an operand that is a constant, None if it is not
+'''
+def constValue(operand):
+
+    return operand.const if operand.slot == None else None
+
+
+def toInt(val):
+
+    return val if type(val) is int else int(val)
+
+
+def foldAssign(instr, constD):
+
+    varName, var1, var2 = instr.operands
+
+    op = instr.op
+
+    if op == None or var2 == None:
+        return withOperands(instr, (varName, foldOperand(var1, constD), var2))
+
+    try:
+
+        # the variable of + and - is read by slot and never as a constant
+        if op in ('+', '-'):
+            value = constD.get(var1.slot, None)
+
+            if value == None:
+                return instr
+
+            amount = var2.const if var2.const != None else int(var2.text)
+
+            return assignConstant(instr, var1.text, value + amount if op == '+' else value - amount)
+
+        # ASSIGN comparisons compare the tokens themselves, not the values of variables
+        if op in ('>', '>='):
+            val1 = toInt(var1.const if var1.const != None else var1.text)
+
+            val2 = toInt(var2.const if var2.const != None else var2.text)
+
+            return assignConstant(instr, var1.text, val1 > val2 if op == '>' else val1 >= val2)
+
+        var1 = foldOperand(var1, constD)
+
+        var2 = foldOperand(var2, constD)
+
+        if op not in ('*', '&') or constValue(var1) == None or constValue(var2) == None:
+            return withOperands(instr, (varName, var1, var2))
+
+        if op == '*':
+            return assignConstant(instr, var1.text, repeatValue(var1.const, toInt(var2.const)))
+
+        return assignConstant(instr, var1.text, concatValues(var1.const, var2.const))
+
+    except Exception:
+        return instr
+
+
+'''
+Folds an IF with constant operands into a GOTO when it always
+branches and into a NOP when it never does
+'''
+def foldIf(instr, constD):
+
+    op1, op2 = (foldOperand(arg, constD) for arg in instr.operands)
+
+    instr = withOperands(instr, (op1, op2))
+
+    if instr.target == None:
+        return instr
+
+    if instr.op not in BRANCH_OPS:
+        return Instruction(NOP, instr.lineNum, instr.text)
+
+    val1 = constValue(op1)
+
+    val2 = constValue(op2)
+
+    if val1 == None or val2 == None:
+        return instr
+
+    try:
+        val1 = toInt(val1)
+
+        val2 = toInt(val2)
+
+    except Exception:
+        return instr
+
+    taken = {'>': val1 > val2, '>=': val1 >= val2, '<': val1 < val2, '<=': val1 <= val2}[instr.op]
+
+    if taken:
+        return Instruction(GOTO, instr.lineNum, instr.text, label=instr.label, target=instr.target)
+
+    return Instruction(NOP, instr.lineNum, instr.text)
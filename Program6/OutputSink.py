@@ -0,0 +1,100 @@
+import sys
+
+'''
+Responsible for collecting the output of a BEEP program and
+writing it to a stream in large batches instead of once per
+PRINT argument
+'''
+
+
+class OutputSink:
+
+    DEFAULT_BUFFER_SIZE = 8192
+
+    '''
+    Constructor for OutputSink
+
+    stream is written to when the buffer fills or the sink is
+    flushed, sys.stdout at the time of the flush if it is None.
+    A bufferSize of 0 writes every piece of output immediately.
+    In capture mode output is kept in memory and never written.
+    '''
+
+    def __init__(self, stream=None, bufferSize=DEFAULT_BUFFER_SIZE, capture=False):
+
+        self.stream = stream            # stream output is written to
+
+        self.bufferSize = bufferSize    # number of characters buffered before a write
+
+        self.capture = capture          # keep output in memory instead of writing it
+
+        self.pieces = []                # output not yet written
+
+        self.size = 0                   # number of characters in pieces
+
+        self.captured = []              # output written in capture mode
+
+        self.flushes = 0                # number of times buffered output has been written
+
+    '''
+    Adds text to the buffer, writing the buffer
+    out if it has reached bufferSize
+    '''
+
+    def write(self, text):
+
+        self.pieces.append(text)
+
+        self.size += len(text)
+
+        if self.size >= self.bufferSize:
+            self.flush()
+
+    '''
+    Writes all buffered output to the stream
+    '''
+
+    def flush(self):
+
+        if not self.pieces:
+            return
+
+        text = "".join(self.pieces)
+
+        self.pieces = []
+
+        self.size = 0
+
+        self.flushes += 1
+
+        if self.capture:
+            self.captured.append(text)
+
+        else:
+            stream = self.stream if self.stream != None else sys.stdout
+
+            stream.write(text)
+
+            stream.flush()
+
+    '''
+    Returns all output written in capture mode
+    '''
+
+    def getvalue(self):
+
+        self.flush()
+
+        return "".join(self.captured)
+
+    '''
+    Flushes the sink and closes its stream unless it is
+    the standard output
+    '''
+
+    def close(self):
+
+        self.flush()
+
+        if self.stream != None and self.stream not in (sys.stdout, sys.stderr):
+            self.stream.close()
@@ -0,0 +1,237 @@
+from Compiler import IF
+import time, json, bisect
+
+'''
+Responsible for recording how often each line of a BEEP program
+is executed and how long it takes, and reporting the hot spots
+by line, by label and by opcode
+'''
+
+
+class Profiler:
+
+    '''
+    Constructor for Profiler
+    '''
+
+    def __init__(self):
+
+        self.hits = {}          # dictionary of line number to times executed
+
+        self.seconds = {}       # dictionary of line number to cumulative time
+
+        self.branches = {}      # dictionary of IF line number to [taken, not taken]
+
+        self.instrD = {}        # dictionary of line number to instruction
+
+        self.executor = None    # executor being profiled
+
+    '''
+        Purpose:
+            Profiles every instruction the executor runs from now on.
+
+        Parameters:
+            executor  -  Executor to profile
+
+        Notes:
+            The executor's handlers are replaced by timed wrappers, the
+            one for IF counting the branch outcome, so the executor
+            itself pays nothing when it is not profiled.
+            Superinstructions, and with them loop summaries, are
+            turned off so each line is timed on its own, and constant
+            folding so every IF is counted as written. A program the
+            executor has already folded is decoded again when it runs.
+
+        Return:
+            Void
+    '''
+
+    def attach(self, executor):
+
+        self.executor = executor
+
+        executor.folding = False
+
+        # the folded instructions hold GOTOs and NOPs in place of constant IFs
+        if executor.folded:
+            executor.code = None
+
+            executor.folded = False
+
+            executor.constSlots = frozenset()
+
+            executor.kindD = None
+
+        executor.fusion = False
+
+        executor.fused = None
+
+        handlers = executor.bindHandlers()
+
+        for opcode, handler in list(handlers.items()):
+            handlers[opcode] = self.timed(handler)
+
+        handlers[IF] = self.timed(self.countedIf)
+
+    '''
+    Executes an IF as Executor.execIf does, counting whether it branches
+    '''
+
+    def countedIf(self, instr):
+
+        executor = self.executor
+
+        op1, op2 = instr.operands
+
+        taken = executor.evalIf(instr.op, op1, op2, instr.label, instr.target)
+
+        self.branches.setdefault(instr.lineNum, [0, 0])[0 if taken else 1] += 1
+
+        if not taken:
+            executor.lineNum += 1
+
+    def timed(self, handler):
+
+        hits = self.hits
+
+        seconds = self.seconds
+
+        def timedHandler(instr):
+
+            lineNum = self.lineNum = instr.lineNum
+
+            start = time.perf_counter()
+
+            try:
+                handler(instr)
+
+            finally:
+                seconds[lineNum] = seconds.get(lineNum, 0.0) + time.perf_counter() - start
+
+                if lineNum not in hits:
+                    hits[lineNum] = 0
+
+                    self.instrD[lineNum] = instr
+
+                hits[lineNum] += 1
+
+        return timedHandler
+
+    '''
+    Name of the opcode of an instruction, with the operator of
+    an ASSIGN or IF so that for example + and * are told apart
+    '''
+
+    def opcodeName(self, instr):
+
+        return "%s %s" % (instr.opcode, instr.op) if instr.op != None else instr.opcode
+
+    '''
+        Purpose:
+            Totals the line statistics by label and by opcode.
+
+        Notes:
+            A line belongs to the nearest label at or above it,
+            lines above the first label belong to (start).
+
+        Return:
+            Tuple of the label and opcode dictionaries, each a
+            mapping of name to [hits, seconds]
+    '''
+
+    def totals(self):
+
+        labels = sorted((lineNum, name) for name, lineNum in self.executor.labelD.items())
+
+        labelLines = [lineNum for lineNum, name in labels]
+
+        labelTotals = {}
+
+        opcodeTotals = {}
+
+        for lineNum, hits in self.hits.items():
+
+            index = bisect.bisect_right(labelLines, lineNum) - 1
+
+            label = labels[index][1] if index >= 0 else "(start)"
+
+            for name, totals in ((label, labelTotals), (self.opcodeName(self.instrD[lineNum]), opcodeTotals)):
+                entry = totals.setdefault(name, [0, 0.0])
+
+                entry[0] += hits
+
+                entry[1] += self.seconds[lineNum]
+
+        return labelTotals, opcodeTotals
+
+    '''
+        Purpose:
+            Writes the hot spot report, hottest first.
+
+        Parameters:
+            out    -  Stream or OutputSink to write to
+            limit  -  Number of lines to list
+
+        Return:
+            Void
+    '''
+
+    def report(self, out, limit=20):
+
+        total = sum(self.seconds.values()) or 1.0
+
+        out.write("Profile: %d lines executed in %.6f seconds\n" % (sum(self.hits.values()), sum(self.seconds.values())))
+
+        out.write("%6s %10s %12s %7s  %s\n" % ("Line", "Hits", "Seconds", "Time%", "Statement"))
+
+        for lineNum in sorted(self.hits, key=lambda lineNum: -self.seconds[lineNum])[:limit]:
+            out.write("%6d %10d %12.6f %6.1f%%  %s\n" % (lineNum, self.hits[lineNum], self.seconds[lineNum],
+                                                         100.0 * self.seconds[lineNum] / total,
+                                                         self.instrD[lineNum].text.strip()))
+
+        labelTotals, opcodeTotals = self.totals()
+
+        for title, totals in (("Label", labelTotals), ("Opcode", opcodeTotals)):
+
+            out.write("%-12s %10s %12s %7s\n" % (title, "Hits", "Seconds", "Time%"))
+
+            for name in sorted(totals, key=lambda name: -totals[name][1]):
+                hits, seconds = totals[name]
+
+                out.write("%-12s %10d %12.6f %6.1f%%\n" % (name, hits, seconds, 100.0 * seconds / total))
+
+        if self.branches:
+            out.write("%6s %10s %10s  %s\n" % ("IF", "Taken", "Not taken", "Statement"))
+
+            for lineNum in sorted(self.branches):
+                taken, notTaken = self.branches[lineNum]
+
+                out.write("%6d %10d %10d  %s\n" % (lineNum, taken, notTaken, self.instrD[lineNum].text.strip()))
+
+    '''
+        Purpose:
+            Writes the profile as JSON.
+
+        Parameters:
+            filename  -  File to write
+
+        Return:
+            Void
+    '''
+
+    def dump(self, filename):
+
+        labelTotals, opcodeTotals = self.totals()
+
+        profile = {
+            "lines": [{"line": lineNum, "hits": self.hits[lineNum], "seconds": self.seconds[lineNum],
+                       "opcode": self.opcodeName(self.instrD[lineNum]), "text": self.instrD[lineNum].text.rstrip("\n")}
+                      for lineNum in sorted(self.hits)],
+            "labels": {name: {"hits": hits, "seconds": seconds} for name, (hits, seconds) in labelTotals.items()},
+            "opcodes": {name: {"hits": hits, "seconds": seconds} for name, (hits, seconds) in opcodeTotals.items()},
+            "branches": [{"line": lineNum, "taken": taken, "notTaken": notTaken}
+                         for lineNum, (taken, notTaken) in sorted(self.branches.items())],
+        }
+
+        with open(filename, "w") as file:
+            json.dump(profile, file, indent=2)
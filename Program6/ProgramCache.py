@@ -0,0 +1,155 @@
+import os, pickle, hashlib, zlib
+
+'''
+Responsible for keeping loaded and compiled BEEP programs on
+disk, keyed by a hash of the source, so a program that has not
+changed is not parsed again
+'''
+
+
+class ProgramCache:
+
+    CACHE_VERSION = 1                       # part of every key, bump when entries change shape
+
+    DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'beep')
+
+    DEFAULT_MAX_BYTES = 16 * 1024 * 1024    # total size of the entries before eviction
+
+    '''
+    Constructor for ProgramCache
+    '''
+
+    def __init__(self, directory=None, maxBytes=DEFAULT_MAX_BYTES):
+
+        self.directory = directory if directory != None else ProgramCache.DEFAULT_DIRECTORY
+
+        self.maxBytes = maxBytes        # entries are evicted above this total size
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    '''
+        Purpose:
+            Computes the cache key of a BEEP source.
+
+        Parameters:
+            data  -  Contents of the source file as bytes
+
+        Notes:
+            Any change to the file changes the key, so a stale
+            entry is never found; it ages out of the cache instead.
+
+        Return:
+            Key as a hex string
+    '''
+
+    def key(self, data):
+
+        digest = hashlib.sha256(b"%d:" % (ProgramCache.CACHE_VERSION))
+
+        digest.update(data)
+
+        return digest.hexdigest()
+
+    def path(self, key):
+
+        return os.path.join(self.directory, key + ".beepc")
+
+    '''
+        Purpose:
+            Reads the entry for key.
+
+        Notes:
+            A hit touches the entry so it is the most recently used.
+            An entry that cannot be read is removed and treated as
+            a miss.
+
+        Return:
+            The cached entry or None if there is no entry for key
+    '''
+
+    def get(self, key):
+
+        path = self.path(key)
+
+        try:
+            with open(path, "rb") as file:
+                entry = pickle.loads(zlib.decompress(file.read()))
+
+        except FileNotFoundError:
+            return None
+
+        except Exception:
+            self.remove(path)
+
+            return None
+
+        os.utime(path)
+
+        return entry
+
+    '''
+        Purpose:
+            Stores entry under key and evicts the least recently
+            used entries if the cache is over maxBytes.
+
+        Notes:
+            The entry is written to a temporary file and renamed,
+            so a reader never sees a partly written entry.
+    '''
+
+    def put(self, key, entry):
+
+        path = self.path(key)
+
+        tmpPath = "%s.%d.tmp" % (path, os.getpid())
+
+        with open(tmpPath, "wb") as file:
+            file.write(zlib.compress(pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)))
+
+        os.replace(tmpPath, path)
+
+        self.evict()
+
+    '''
+    Removes the least recently used entries until the
+    cache is no larger than maxBytes
+    '''
+
+    def evict(self):
+
+        entries = []
+
+        for name in os.listdir(self.directory):
+
+            if not name.endswith(".beepc"):
+                continue
+
+            path = os.path.join(self.directory, name)
+
+            try:
+                stat = os.stat(path)
+
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for mtime, size, path in entries)
+
+        # oldest first
+        for mtime, size, path in sorted(entries):
+
+            if total <= self.maxBytes:
+                break
+
+            self.remove(path)
+
+            total -= size
+
+    def remove(self, path):
+
+        try:
+            os.remove(path)
+
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,175 @@
+'''
+Responsible for representing the strings built by the * and &
+operators lazily, as a tree of concatenations and repetitions,
+so that a string grown in a loop is not copied on every step.
+A Rope is flattened into a str only when its text is needed,
+when it is printed or converted for a comparison.
+'''
+
+# strings shorter than this are built directly, a rope only pays off for long ones
+ROPE_THRESHOLD = 256
+
+
+class Rope:
+
+    __slots__ = ('left', 'right', 'count', 'length', 'flat')
+
+    '''
+    Constructor for Rope
+
+    A concatenation has left and right parts, a repetition has
+    left repeated count times. Parts are str or Rope.
+    '''
+
+    def __init__(self, left, right=None, count=None):
+
+        self.left = left            # first part, or the part repeated
+
+        self.right = right          # second part of a concatenation
+
+        self.count = count          # times left is repeated, None for a concatenation
+
+        self.flat = None            # text of the rope once flattened
+
+        if count != None:
+            self.length = len(left) * count
+
+        else:
+            self.length = len(left) + len(right)
+
+    def __len__(self):
+
+        return self.length
+
+    '''
+        Purpose:
+            Returns the text of the rope.
+
+        Notes:
+            The tree is walked without recursion so a rope built by
+            thousands of concatenations can be flattened. The text is
+            kept and the parts are released, so each rope is only
+            flattened once.
+
+        Return:
+            str
+    '''
+
+    def flatten(self):
+
+        if self.flat != None:
+            return self.flat
+
+        pieces = []
+
+        stack = [self]
+
+        while stack:
+
+            node = stack.pop()
+
+            if type(node) is str:
+                pieces.append(node)
+
+            elif node.flat != None:
+                pieces.append(node.flat)
+
+            elif node.count != None:
+                left = node.left
+
+                pieces.append((left.flatten() if type(left) is Rope else left) * node.count)
+
+            else:
+                stack.append(node.right)
+
+                stack.append(node.left)
+
+        self.flat = "".join(pieces)
+
+        self.left = self.right = None
+
+        return self.flat
+
+    def __str__(self):
+
+        return self.flatten()
+
+    def __repr__(self):
+
+        return "Rope(%d)" % (self.length)
+
+    # + with a str, * by a count and int() act on the text; a rope
+    # has no other str behaviour and compares and hashes by identity,
+    # so Executor.variableValues flattens ropes before they leave it
+    def __add__(self, other):
+
+        return self.flatten() + other
+
+    def __radd__(self, other):
+
+        return other + self.flatten()
+
+    def __mul__(self, other):
+
+        return self.flatten() * other
+
+    def __int__(self):
+
+        return int(self.flatten())
+
+
+'''
+    Purpose:
+        Concatenates two values for the & operator.
+
+    Notes:
+        Only strings and ropes are joined lazily; any other values
+        are added as the & operator always did.
+
+    Return:
+        str, Rope or the sum of the values
+'''
+def concatValues(val1, val2):
+
+    type1 = type(val1)
+
+    type2 = type(val2)
+
+    if (type1 is str or type1 is Rope) and (type2 is str or type2 is Rope):
+
+        if type1 is str and type2 is str and len(val1) + len(val2) < ROPE_THRESHOLD:
+            return val1 + val2
+
+        # appending a short string to a rope ending in a short string joins
+        # the two, so a string grown a piece at a time has few large leaves
+        if type1 is Rope and type2 is str and val1.count == None and val1.flat == None \
+                and type(val1.right) is str and len(val1.right) + len(val2) < ROPE_THRESHOLD:
+            return Rope(val1.left, val1.right + val2)
+
+        return Rope(val1, val2)
+
+    return val1 + val2
+
+
+'''
+    Purpose:
+        Repeats a value count times for the * operator.
+
+    Return:
+        str, Rope or the product of the values
+'''
+def repeatValue(val1, count):
+
+    type1 = type(val1)
+
+    if type1 is str or type1 is Rope:
+
+        if count <= 0:
+            return ""
+
+        if type1 is str and len(val1) * count < ROPE_THRESHOLD:
+            return val1 * count
+
+        return Rope(val1, count=count)
+
+    return val1 * count
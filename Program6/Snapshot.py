@@ -0,0 +1,283 @@
+from Executor import Executor, UNDEFINED
+import os, struct, hashlib, zlib
+
+'''
+Responsible for saving the state of a running BEEP program in a
+compact binary snapshot and restoring it, so a long run can be
+resumed in another process or after a crash. The state is the
+variable slots, the line to execute next and the count of lines
+executed; the snapshot also holds a hash of the source so it is
+only ever restored into the program it was taken from.
+'''
+
+MAGIC = b"BEEPSNAP"
+
+SNAPSHOT_VERSION = 1
+
+DEFAULT_INTERVAL = 100000   # lines executed between snapshots
+
+# header: magic, version, source hash, lineNum, execCount, number of slots
+HEADER = struct.Struct(">8sH32sQQI")
+
+# tags of the slot values
+TAG_UNDEFINED = b"U"    # never assigned
+TAG_NONE      = b"N"    # declared without a value
+TAG_TRUE      = b"T"
+TAG_FALSE     = b"F"
+TAG_INT       = b"I"    # followed by the length and the signed big-endian bytes
+TAG_STRING    = b"S"    # followed by the length and the UTF-8 bytes
+
+LENGTH = struct.Struct(">I")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+'''
+    Purpose:
+        Computes the hash a snapshot is matched to its program by.
+
+    Parameters:
+        source  -  List of source lines
+
+    Return:
+        SHA-256 digest as 32 bytes
+'''
+def programHash(source):
+
+    digest = hashlib.sha256()
+
+    for line in source:
+        digest.update(line.encode('utf-8', 'surrogatepass'))
+
+    return digest.digest()
+
+
+'''
+    Purpose:
+        Takes a snapshot of an executor between runs.
+
+    Parameters:
+        executor  -  Executor that has been compiled and is not running
+
+    Notes:
+        A string built lazily by * or & is saved as the string.
+
+    Return:
+        Snapshot as bytes
+'''
+def takeSnapshot(executor):
+
+    executor.compile()
+
+    values = executor.values
+
+    parts = [HEADER.pack(MAGIC, SNAPSHOT_VERSION, programHash(executor.source), executor.lineNum,
+                         executor.execCount, len(values))]
+
+    for value in values:
+
+        if value is UNDEFINED:
+            parts.append(TAG_UNDEFINED)
+
+        elif value == None:
+            parts.append(TAG_NONE)
+
+        elif value is True or value is False:
+            parts.append(TAG_TRUE if value else TAG_FALSE)
+
+        elif type(value) is int:
+            data = value.to_bytes(value.bit_length() // 8 + 1, 'big', signed=True)
+
+            parts.extend((TAG_INT, LENGTH.pack(len(data)), data))
+
+        else:
+            data = str(value).encode('utf-8', 'surrogatepass')
+
+            parts.extend((TAG_STRING, LENGTH.pack(len(data)), data))
+
+    return zlib.compress(b"".join(parts))
+
+
+'''
+    Purpose:
+        Restores a snapshot into an executor.
+
+    Parameters:
+        executor  -  Executor for the program the snapshot was taken from
+        data      -  Snapshot as bytes
+
+    Notes:
+        Raises SnapshotError if the snapshot cannot be read or was
+        taken from a different program; the executor is unchanged.
+        Continue the run with resume, not execute.
+
+    Return:
+        Void
+'''
+def restoreSnapshot(executor, data):
+
+    try:
+        data = zlib.decompress(data)
+
+        magic, version, sourceHash, lineNum, execCount, numSlots = HEADER.unpack_from(data)
+
+    except (zlib.error, struct.error) as e:
+        raise SnapshotError("snapshot cannot be read: %s" % (e))
+
+    if magic != MAGIC or version != SNAPSHOT_VERSION:
+        raise SnapshotError("not a version %d snapshot" % (SNAPSHOT_VERSION))
+
+    executor.compile()
+
+    if sourceHash != programHash(executor.source) or numSlots != len(executor.values):
+        raise SnapshotError("snapshot was taken from a different program")
+
+    values = []
+
+    pos = HEADER.size
+
+    try:
+
+        for slot in range(numSlots):
+
+            tag = data[pos:pos + 1]
+
+            pos += 1
+
+            if tag == TAG_UNDEFINED:
+                values.append(UNDEFINED)
+
+            elif tag == TAG_NONE:
+                values.append(None)
+
+            elif tag in (TAG_TRUE, TAG_FALSE):
+                values.append(tag == TAG_TRUE)
+
+            elif tag in (TAG_INT, TAG_STRING):
+                length = LENGTH.unpack_from(data, pos)[0]
+
+                pos += LENGTH.size
+
+                value = data[pos:pos + length]
+
+                pos += length
+
+                if tag == TAG_INT:
+                    values.append(int.from_bytes(value, 'big', signed=True))
+
+                else:
+                    values.append(value.decode('utf-8', 'surrogatepass'))
+
+            else:
+                raise SnapshotError("snapshot has an unknown value tag %r" % (tag))
+
+    except (struct.error, UnicodeDecodeError) as e:
+        raise SnapshotError("snapshot cannot be read: %s" % (e))
+
+    executor.values = values
+
+    executor.shared = False
+
+    # values given to the run the snapshot was taken from may not be the declared kinds
+    executor.checkKinds()
+
+    executor.lineNum = lineNum
+
+    executor.execCount = execCount
+
+    executor.state = Executor.SUSPENDED
+
+    executor.error = None
+
+
+'''
+    Purpose:
+        Writes a snapshot of an executor to a file.
+
+    Notes:
+        The snapshot is written to a temporary file and renamed,
+        so a crash while writing leaves the previous snapshot.
+'''
+def writeSnapshot(executor, path):
+
+    tmpPath = "%s.%d.tmp" % (path, os.getpid())
+
+    with open(tmpPath, "wb") as file:
+        file.write(takeSnapshot(executor))
+
+    os.replace(tmpPath, path)
+
+
+'''
+Restores the snapshot in the file at path into an executor
+'''
+def readSnapshot(executor, path):
+
+    with open(path, "rb") as file:
+        restoreSnapshot(executor, file.read())
+
+
+'''
+    Purpose:
+        Executes a program, writing a snapshot periodically.
+
+    Parameters:
+        executor  -  Executor for the program
+        fileList  -  List of source lines to execute
+        path      -  Snapshot file
+        interval  -  Lines executed between snapshots
+        verbose   -  Print each line as it is executed
+
+    Notes:
+        If path holds a snapshot of the program, execution resumes
+        from it instead of from line 1; a snapshot of a different
+        program is reported and ignored. A snapshot is written every
+        interval lines and removed when execution stops, however it
+        stops.
+
+    Return:
+        FINISHED, FAILED or SUSPENDED
+'''
+def executeWithSnapshots(executor, fileList, path, interval=DEFAULT_INTERVAL, verbose=False):
+
+    executor.source = fileList
+
+    resumed = False
+
+    if os.path.isfile(path):
+
+        try:
+            readSnapshot(executor, path)
+
+            resumed = True
+
+        except SnapshotError as e:
+            executor.out.write("*** %s ignored, %s ***\n" % (path, e.args[0]))
+
+    if resumed:
+        executor.out.write("execution resumes at line %d, %d lines executed ...\n" % (executor.lineNum, executor.execCount))
+
+    else:
+        executor.compile()
+
+        executor.out.write("execution begins ...\n")
+
+    while True:
+
+        state = executor.resume(interval, None, verbose)
+
+        if state != Executor.SUSPENDED:
+            break
+
+        if executor.limitReached():
+            break
+
+        writeSnapshot(executor, path)
+
+    # the snapshot is only left behind if the process dies before the run ends
+    if os.path.isfile(path):
+        os.remove(path)
+
+    return state
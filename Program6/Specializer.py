@@ -0,0 +1,366 @@
+from Compiler import Instruction, ASSIGN, IF, UNDEFINED
+from ControlFlow import Superinstruction, BRANCH_OPS
+from Rope import Rope
+import operator
+
+'''
+Responsible for specializing instructions to the types of their
+operands. The kinds of value each variable can ever hold are
+inferred from its declaration and every ASSIGN to it; where the
+kinds prove an operation can neither fail nor need a conversion,
+its instruction is replaced by one that does the operation
+directly. Operations that can never succeed are type errors.
+'''
+
+# opcodes of specialized instructions
+INT_ADD    = 'INT_ADD'      # ASSIGN + or - of an int variable and an int constant
+INT_IF     = 'INT_IF'       # IF comparing two ints
+STR_CONCAT = 'STR_CONCAT'   # ASSIGN & of two strings
+STR_REPEAT = 'STR_REPEAT'   # ASSIGN * of a string and an int
+
+# opcodes that assign their first operand
+ASSIGN_OPCODES = (ASSIGN, INT_ADD, STR_CONCAT, STR_REPEAT)
+
+# kinds of value a variable can hold
+INT    = 'int'
+BOOL   = 'bool'             # result of the ASSIGN comparisons
+STRING = 'string'           # str or Rope
+NONE   = 'none'             # declared without a value
+UNSET  = 'unset'            # never assigned
+
+NUMBERS = frozenset((INT, BOOL))
+
+COMPARES = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+
+class TypedInstruction(Instruction):
+
+    '''
+    Constructor for TypedInstruction
+
+    The instruction keeps the fields of the generic instruction it
+    replaces; values holds (slot, constant) for each operand read,
+    slot None for a constant
+    '''
+
+    def __init__(self, opcode, generic, values, amount=None, compare=None):
+
+        super().__init__(opcode, generic.lineNum, generic.text, generic.op, generic.operands,
+                         generic.label, generic.target)
+
+        self.slot = generic.operands[0].slot if generic.opcode == ASSIGN else None    # slot assigned
+
+        self.values = values        # (slot, constant) of each operand read
+
+        self.amount = amount        # int added by INT_ADD, negative for -
+
+        self.compare = compare      # comparison function of INT_IF
+
+
+'''
+Returns the kind of a value
+'''
+def valueKind(value):
+
+    kind = type(value)
+
+    if kind is int:
+        return INT
+
+    if kind is str or kind is Rope:
+        return STRING
+
+    if kind is bool:
+        return BOOL
+
+    if value is None:
+        return NONE
+
+    return UNSET if value is UNDEFINED else None
+
+
+'''
+    Purpose:
+        Infers the kinds of value each variable can hold.
+
+    Parameters:
+        code       -  List of Instruction, one per source line
+        varValueD  -  Dictionary with mapping of var name to declared value
+        slotD      -  Dictionary with mapping of var name to slot
+
+    Notes:
+        A variable starts as the kind of its declared value, or
+        UNSET, and takes the kinds of every value assigned to it,
+        until no kinds are added.
+
+    Return:
+        Dictionary with mapping of slot to frozenset of kinds
+'''
+def inferKinds(code, varValueD, slotD):
+
+    kindD = {slot: {UNSET} for slot in slotD.values()}
+
+    for name, value in varValueD.items():
+        kindD[slotD[name]] = {valueKind(value)}
+
+    assigns = [instr for instr in code if instr.opcode == ASSIGN]
+
+    changed = True
+
+    while changed:
+
+        changed = False
+
+        for instr in assigns:
+
+            kinds = resultKinds(instr, kindD)
+
+            target = kindD[instr.operands[0].slot]
+
+            if not kinds <= target:
+                target.update(kinds)
+
+                changed = True
+
+    return {slot: frozenset(kinds) for slot, kinds in kindD.items()}
+
+
+'''
+Kinds of value evalSymbol can return for an operand
+'''
+def operandKinds(operand, kindD):
+
+    if operand.slot == None:
+        return {valueKind(operand.const)}
+
+    kinds = set(kindD[operand.slot])
+
+    # a variable without a value reads as the token's constant
+    if NONE in kinds or UNSET in kinds:
+        kinds -= {NONE, UNSET}
+
+        kinds.add(valueKind(operand.const))
+
+    return kinds
+
+
+'''
+Kinds of value an operand can hold when it is read from its
+slot without the fallback to the token's constant
+'''
+def directKinds(operand, kindD):
+
+    return kindD[operand.slot] if operand.slot != None else {valueKind(operand.const)}
+
+
+'''
+Returns the int added by + or -, None if the token is not an int
+'''
+def amountOf(operand):
+
+    if operand.const != None:
+        return operand.const if type(operand.const) is int else None
+
+    try:
+        return int(operand.text)
+
+    except ValueError:
+        return None
+
+
+'''
+Kinds of value an ASSIGN can store, empty if it always fails
+'''
+def resultKinds(instr, kindD):
+
+    varName, var1, var2 = instr.operands
+
+    op = instr.op
+
+    if op == None and var2 == None:
+        return operandKinds(var1, kindD) - {NONE}
+
+    if op == None or var2 == None:
+        return set()
+
+    if op in ('+', '-'):
+        return {INT} if kindD[var1.slot] & NUMBERS and amountOf(var2) != None else set()
+
+    if op in ('>', '>='):
+        return {BOOL}
+
+    kinds1 = operandKinds(var1, kindD)
+
+    kinds2 = operandKinds(var2, kindD)
+
+    if op == '*':
+        result = {STRING} if STRING in kinds1 else set()
+
+        return result | ({INT} if kinds1 & NUMBERS else set()) if kinds2 - {NONE} else set()
+
+    if op == '&':
+        result = {STRING} if STRING in kinds1 and STRING in kinds2 else set()
+
+        return result | ({INT} if kinds1 & NUMBERS and kinds2 & NUMBERS else set())
+
+    return set()
+
+
+'''
+    Purpose:
+        Replaces instructions by specialized ones where the kinds
+        of their operands allow.
+
+    Parameters:
+        code   -  List of Instruction and Superinstruction
+        kindD  -  Dictionary with mapping of slot to kinds, from inferKinds
+
+    Notes:
+        An operation is only specialized when every kind its operands
+        can have gives the same result without a check or conversion:
+        + and - of a variable that is always a number, IF of operands
+        that are always numbers, & of two strings and * of a string
+        by an int. The lines of a superinstruction are specialized
+        in place.
+
+    Return:
+        List of Instruction and Superinstruction
+'''
+def specializeCode(code, kindD):
+
+    specialized = []
+
+    for instr in code:
+
+        if type(instr) is Superinstruction:
+            instr = Superinstruction(specialize(instr.first, kindD),
+                                     [(entry, specialize(part, kindD)) for entry, part in instr.parts])
+
+        else:
+            instr = specialize(instr, kindD)
+
+        specialized.append(instr)
+
+    return specialized
+
+
+'''
+Returns the specialized instruction for instr, or instr itself
+'''
+def specialize(instr, kindD):
+
+    if instr.opcode == IF:
+
+        if instr.op not in BRANCH_OPS or instr.target == None:
+            return instr
+
+        if all(directKinds(arg, kindD) <= NUMBERS for arg in instr.operands):
+            return TypedInstruction(INT_IF, instr, operandValues(instr.operands), compare=COMPARES[instr.op])
+
+        return instr
+
+    if instr.opcode != ASSIGN or instr.op == None or instr.operands[2] == None:
+        return instr
+
+    varName, var1, var2 = instr.operands
+
+    if instr.op in ('+', '-') and kindD[var1.slot] <= NUMBERS:
+        amount = amountOf(var2)
+
+        if amount == None:
+            return instr
+
+        return TypedInstruction(INT_ADD, instr, operandValues((var1,)), amount if instr.op == '+' else -amount)
+
+    kinds1 = directKinds(var1, kindD)
+
+    kinds2 = directKinds(var2, kindD)
+
+    if instr.op == '&' and kinds1 == kinds2 == {STRING}:
+        return TypedInstruction(STR_CONCAT, instr, operandValues((var1, var2)))
+
+    if instr.op == '*' and kinds1 == {STRING} and kinds2 == {INT}:
+        return TypedInstruction(STR_REPEAT, instr, operandValues((var1, var2)))
+
+    return instr
+
+
+def operandValues(operands):
+
+    return tuple((arg.slot, arg.const) for arg in operands)
+
+
+'''
+    Purpose:
+        Finds the lines that fail whenever they are executed.
+
+    Parameters:
+        code   -  List of Instruction, one per source line
+        kindD  -  Dictionary with mapping of slot to kinds, from inferKinds
+
+    Return:
+        List of (line number, message)
+'''
+def typeErrors(code, kindD):
+
+    found = []
+
+    for instr in code:
+
+        if instr.opcode == ASSIGN:
+            message = assignError(instr, kindD)
+
+        elif instr.opcode == IF and instr.op in BRANCH_OPS:
+            message = ifError(instr, kindD)
+
+        else:
+            message = None
+
+        if message != None:
+            found.append((instr.lineNum, message))
+
+    return found
+
+
+def assignError(instr, kindD):
+
+    varName, var1, var2 = instr.operands
+
+    op = instr.op
+
+    if op == None and var2 == None:
+        return "%s is not defined" % (var1.text) if operandKinds(var1, kindD) == {NONE} else None
+
+    if op in ('+', '-') and var2 != None:
+
+        if amountOf(var2) == None:
+            return "%s is not an int constant" % (var2.text)
+
+        if not kindD[var1.slot] & NUMBERS:
+            return "%s is never a number" % (var1.text)
+
+    if op in ('*', '&') and var2 != None:
+        kinds1 = operandKinds(var1, kindD)
+
+        kinds2 = operandKinds(var2, kindD)
+
+        if kinds1 == {NONE} or kinds2 == {NONE}:
+            return "%s has no value" % (var1.text if kinds1 == {NONE} else var2.text)
+
+        if op == '&' and kinds1 <= {STRING} and kinds2 <= NUMBERS:
+            return "cannot join string %s and number %s" % (var1.text, var2.text)
+
+        if op == '&' and kinds1 <= NUMBERS and kinds2 <= {STRING}:
+            return "cannot join number %s and string %s" % (var1.text, var2.text)
+
+    return None
+
+
+def ifError(instr, kindD):
+
+    for arg in instr.operands:
+
+        if operandKinds(arg, kindD) == {NONE}:
+            return "%s has no value to compare" % (arg.text)
+
+    return None
@@ -0,0 +1,197 @@
+from p5Dict import declareVar
+from Compiler import compileLine, compileToken, allocAssignSlots, resolveInstruction, ASSIGN
+from Lexer import scanLine, declares
+import re, sys, mmap
+from array import array
+
+'''
+Responsible for loading very large BEEP sources without reading
+them into a list of lines. The file is memory mapped, one scan
+finds the start of each line and the lines that build the label
+and VAR tables, and lines are decoded and compiled only when the
+Executor reaches them
+'''
+
+# one line, the group matched if the line may hold a label, a
+# declaration or an ASSIGN; each line the group matches is decoded
+# and matched once by the Lexer, as loadSource does
+lineRE = re.compile(rb'(?m)^(VAR|[^\n:]*:|[^\n]*ASSIGN)?[^\n]*\n?')
+
+
+class LazySource:
+
+    '''
+    Constructor for LazySource
+    '''
+
+    def __init__(self, filename):
+
+        self.file = open(filename, "rb")
+
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # an empty file cannot be mapped
+        except ValueError:
+            self.data = b""
+
+        self.offsets = array('q', [0])  # offset of the start of each line, then the end of the file
+
+        self.candidates = array('q')    # index of each line lineRE marks as a candidate
+
+        for mo in lineRE.finditer(self.data):
+
+            # the empty match after the last newline is not a line
+            if mo.end() == mo.start():
+                continue
+
+            if mo.lastindex != None:
+                self.candidates.append(len(self.offsets) - 1)
+
+            self.offsets.append(mo.end())
+
+    def __len__(self):
+
+        return len(self.offsets) - 1
+
+    '''
+    Decodes line index, counting from 0, the way readline
+    returns it from a file opened in text mode
+    '''
+
+    def __getitem__(self, index):
+
+        if index < 0:
+            index += len(self)
+
+        if index < 0 or index >= len(self):
+            raise IndexError("line index out of range")
+
+        line = self.data[self.offsets[index]:self.offsets[index + 1]].decode('latin-1')
+
+        if line.endswith("\r\n"):
+            line = line[:-2] + "\n"
+
+        return line
+
+    def __iter__(self):
+
+        for index in range(len(self)):
+            yield self[index]
+
+    def close(self):
+
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+        self.file.close()
+
+
+class LazyCode:
+
+    '''
+    Constructor for LazyCode
+    '''
+
+    def __init__(self, source, labelD, slotD):
+
+        self.source = source        # LazySource of the program
+
+        self.labelD = labelD        # dictionary for labels
+
+        self.slotD = slotD          # dictionary for var slot, complete before any line is compiled
+
+        self.code = [None] * len(source)    # compiled instructions, None until first reached
+
+    def __len__(self):
+
+        return len(self.code)
+
+    '''
+    Returns the instruction for line index + 1,
+    compiling the line the first time it is reached
+    '''
+
+    def __getitem__(self, index):
+
+        instr = self.code[index]
+
+        if instr == None:
+            instr = compileLine(self.source[index], index + 1, self.labelD)
+
+            resolveInstruction(instr, self.slotD)
+
+            self.code[index] = instr
+
+        return instr
+
+    def __iter__(self):
+
+        for index in range(len(self)):
+            yield self[index]
+
+
+'''
+    Purpose:
+        Loads a BEEP program by memory mapping its source.
+
+    Parameters:
+        filename  -  Path of the BEEP source file
+        out       -  Stream or OutputSink for errors, standard output if None
+
+    Notes:
+        Only the lines marked by lineRE are decoded while loading,
+        the rest are decoded when they are executed. The source is
+        not listed. Lines are split at newlines; a carriage return
+        before a newline is dropped. The caller closes the
+        LazySource once the program has run.
+
+    Return:
+        Tuple of varTypeD, varValueD, labelD, slotD, the LazySource
+        and the LazyCode
+'''
+def streamProgram(filename, out=None):
+
+    varTypeD  = {}  # dictionary for variable types
+
+    varValueD = {}  # dictionary for variable values
+
+    labelD    = {}  # dictionary for labels
+
+    slotD     = {}  # dictionary for variable slots
+
+    out = out if out != None else sys.stdout
+
+    source = LazySource(filename)
+
+    assignTokens = []
+
+    for index in source.candidates:
+
+        token = scanLine(source[index])
+
+        lineNum = index + 1
+
+        label = token.group('label')
+
+        if label != None:
+
+            label = label.upper()
+
+            if labelD.get(label, None) != None:
+                out.write("***Error: label '%s' appears on multiple lines: %d and %d\n" % (label, labelD[label], lineNum))
+
+            else:
+                labelD[label] = lineNum
+
+        elif declares(token):
+            declareVar(token, varTypeD, varValueD, slotD)
+
+        if token.lastgroup == ASSIGN:
+            assignTokens.append((lineNum, token))
+
+    # ASSIGN targets get slots after the declared variables, as in compileSource
+    for lineNum, token in assignTokens:
+        allocAssignSlots(compileToken(token, lineNum, labelD), slotD)
+
+    return varTypeD, varValueD, labelD, slotD, source, LazyCode(source, labelD, slotD)
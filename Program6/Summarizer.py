@@ -0,0 +1,358 @@
+from Compiler import Instruction, BLANK, ASSIGN, PRINT, GOTO, IF
+from ControlFlow import Superinstruction, BRANCH_OPS
+from Specializer import INT_IF, amountOf
+
+'''
+Responsible for summarizing counted loops. A loop whose only exit
+is an IF comparing induction variables, variables changed by + or
+- of a constant on every trip, is replaced at its IF by a summary
+of one trip. When the summary is dispatched the Executor works out
+how many trips the loop will make and applies them all at once:
+induction variables jump to their final value, a string grown by &
+is given the repeated piece in one step and the result of an ASSIGN
+that is the same on every trip is computed once. PRINTs are written
+for every trip. The trips are counted as executed, so the count of
+lines executed is the same as when the loop is stepped.
+'''
+
+# opcode of a loop summary
+LOOP = 'LOOP'
+
+# effects of a trip, besides ASSIGN and PRINT
+APPEND  = 'APPEND'      # ASSIGN s & s t, t the same on every trip
+PREPEND = 'PREPEND'     # ASSIGN s & t s, t the same on every trip
+STEP    = 'STEP'        # ASSIGN v + v c or ASSIGN v - v c
+
+# most lines followed from the IF round the loop and back
+MAX_TRIP_LINES = 64
+
+
+class LoopSummary(Instruction):
+
+    '''
+    Constructor for LoopSummary
+
+    The summary keeps the fields of the IF it replaces, which is
+    still executed whenever the summary is dispatched
+    '''
+
+    def __init__(self, header, count, branches, steps, effects):
+
+        super().__init__(LOOP, header.lineNum, header.text, header.op, header.operands,
+                         header.label, header.target)
+
+        self.header = header        # IF that leaves the loop, executed after the trips
+
+        self.count = count          # lines executed on each trip, the IF included
+
+        self.branches = branches    # True if the loop goes round when the IF branches
+
+        self.steps = steps          # dictionary of induction variable slot to the amount added each trip
+
+        self.effects = effects      # ASSIGN, APPEND, PREPEND and PRINT effects of a trip, in order
+
+
+'''
+    Purpose:
+        Replaces the IF of each counted loop by a summary of the loop.
+
+    Parameters:
+        code     -  List of Instruction and Superinstruction
+        generic  -  List of Instruction, one per source line, that
+                    code was built from
+
+    Notes:
+        The loops are found in the generic instructions; the IF
+        kept by a summary is the one in code, so it can be a
+        specialized instruction. An IF that is a line of a
+        superinstruction is replaced in place.
+
+    Return:
+        List of Instruction, Superinstruction and LoopSummary
+'''
+def summarizeLoops(code, generic):
+
+    loopD = {}
+
+    for instr in generic:
+
+        if instr.opcode == IF and instr.op in BRANCH_OPS:
+            loop = findLoop(generic, instr)
+
+            if loop != None:
+                loopD[instr.lineNum] = loop
+
+    if not loopD:
+        return code
+
+    def summarized(instr):
+
+        if instr.lineNum in loopD and instr.opcode in (IF, INT_IF):
+            return LoopSummary(instr, *loopD[instr.lineNum])
+
+        return instr
+
+    summarizedCode = []
+
+    for instr in code:
+
+        if type(instr) is Superinstruction:
+            instr = Superinstruction(summarized(instr.first),
+                                     [(entry, summarized(part)) for entry, part in instr.parts])
+
+        else:
+            instr = summarized(instr)
+
+        summarizedCode.append(instr)
+
+    return summarizedCode
+
+
+'''
+    Purpose:
+        Follows the lines of one trip round a loop.
+
+    Parameters:
+        code    -  List of Instruction, one per source line
+        start   -  Line the IF goes to to stay in the loop
+        header  -  Line number of the IF
+
+    Notes:
+        A trip may only pass through blank lines, comments, GOTOs,
+        ASSIGNs, PRINTs and IFs that never branch; any other IF
+        makes the trip depend on values, and a GOTO to an undefined
+        label stops execution.
+
+    Return:
+        Tuple of the lines executed and the ASSIGNs and PRINTs of
+        the trip in order, None if the lines do not lead back to
+        the IF
+'''
+def tripLines(code, start, header):
+
+    lineNum = start
+
+    count = 1
+
+    body = []
+
+    seen = set()
+
+    while lineNum != header:
+
+        if lineNum == None or not 0 < lineNum <= len(code) or lineNum in seen or len(seen) >= MAX_TRIP_LINES:
+            return None
+
+        seen.add(lineNum)
+
+        instr = code[lineNum - 1]
+
+        lineNum += 1
+
+        if instr.opcode == BLANK:
+            continue
+
+        count += 1
+
+        if instr.opcode in (ASSIGN, PRINT):
+            body.append(instr)
+
+        elif instr.opcode == GOTO:
+            lineNum = instr.target
+
+        elif instr.opcode == IF and instr.op in BRANCH_OPS:
+            return None
+
+    return count, body
+
+
+'''
+    Purpose:
+        Finds the loop an IF leaves, and summarizes one trip.
+
+    Parameters:
+        code    -  List of Instruction, one per source line
+        header  -  IF that may leave a loop
+
+    Notes:
+        Every value a trip reads must be the same on every trip,
+        except that the IF and PRINTs may read induction variables.
+        A value is the same on every trip if no line of the loop
+        assigns it, or if it is read after an ASSIGN whose own
+        operands are the same on every trip. A variable is an
+        induction variable only if every ASSIGN to it adds or
+        subtracts a constant, and a string is grown only if one
+        ASSIGN appends to it and nothing else assigns or reads it.
+
+    Return:
+        Tuple of the lines executed per trip, whether the loop goes
+        round when the IF branches, the induction steps and the
+        effects of a trip, or None if the loop cannot be summarized
+'''
+def findLoop(code, header):
+
+    for branches, start in ((False, header.lineNum + 1), (True, header.target)):
+        trip = tripLines(code, start, header.lineNum)
+
+        if trip != None:
+            break
+
+    else:
+        return None
+
+    count, body = trip
+
+    roleD = {}      # dictionary of slot assigned in the loop to the kinds of ASSIGN to it
+
+    for instr in body:
+
+        if instr.opcode == ASSIGN:
+            roleD.setdefault(instr.operands[0].slot, []).append(assignRole(instr))
+
+    for roles in roleD.values():
+
+        if len(set(roles)) > 1 or roles[0] in (APPEND, PREPEND) and len(roles) > 1:
+            return None
+
+    steps = {}
+
+    effects = []
+
+    defined = set()     # slots given a value the same on every trip, so far in the trip
+
+    def fixed(arg):
+
+        return arg.slot == None or arg.slot not in roleD or arg.slot in defined
+
+    for instr in body:
+
+        if instr.opcode == PRINT:
+            parts = []
+
+            for arg in instr.operands:
+
+                if fixed(arg):
+                    parts.append((arg, None, 0))
+
+                elif roleD[arg.slot][0] == STEP:
+                    parts.append((arg, arg.slot, steps.get(arg.slot, 0)))
+
+                else:
+                    return None
+
+            effects.append((PRINT, tuple(parts)))
+
+            continue
+
+        varName, var1, var2 = instr.operands
+
+        role = roleD[varName.slot][0]
+
+        if role == STEP:
+            amount = amountOf(var2)
+
+            steps[varName.slot] = steps.get(varName.slot, 0) + (amount if instr.op == '+' else -amount)
+
+        elif role in (APPEND, PREPEND):
+            piece = var2 if role == APPEND else var1
+
+            if not fixed(piece):
+                return None
+
+            effects.append((role, varName.slot, piece))
+
+        else:
+
+            if instr.op == None and var2 == None:
+                reads = (var1,)
+
+            elif instr.op in ('*', '&') and var2 != None:
+                reads = (var1, var2)
+
+            elif instr.op in ('+', '-') and var2 != None and var1.slot != None and amountOf(var2) != None:
+                reads = (var1,)
+
+            # comparisons read the tokens, never a variable
+            elif instr.op in ('>', '>=') and var2 != None:
+                reads = ()
+
+            else:
+                return None
+
+            if not all(fixed(arg) for arg in reads):
+                return None
+
+            effects.append((ASSIGN, instr))
+
+            defined.add(varName.slot)
+
+    for arg in header.operands:
+
+        if arg.slot in roleD and roleD[arg.slot][0] != STEP:
+            return None
+
+    return count, branches, steps, tuple(effects)
+
+
+'''
+Kind of ASSIGN an instruction is within a loop: STEP, APPEND,
+PREPEND, or ASSIGN for any other
+'''
+def assignRole(instr):
+
+    varName, var1, var2 = instr.operands
+
+    if var2 == None:
+        return ASSIGN
+
+    if instr.op in ('+', '-') and var1.slot == varName.slot and amountOf(var2) != None:
+        return STEP
+
+    if instr.op == '&' and var1.slot == varName.slot != var2.slot:
+        return APPEND
+
+    if instr.op == '&' and var2.slot == varName.slot != var1.slot:
+        return PREPEND
+
+    return ASSIGN
+
+
+'''
+    Purpose:
+        Counts the trips a loop makes before its IF leaves it.
+
+    Parameters:
+        op          -  Operator of the IF
+        branches    -  True if the loop goes round when the IF branches
+        difference  -  First operand of the IF less the second, on
+                       the trip about to start
+        change      -  Amount difference changes by on each trip
+
+    Return:
+        Number of trips, None if the loop never leaves
+'''
+def tripCount(op, branches, difference, change):
+
+    if not branches:
+        op = {'>': '<=', '>=': '<', '<': '>=', '<=': '>'}[op]
+
+    # the loop goes round while first + trips * step > 0
+    if op == '>':
+        first, step = difference, change
+
+    elif op == '>=':
+        first, step = difference + 1, change
+
+    elif op == '<':
+        first, step = -difference, -change
+
+    else:
+        first, step = 1 - difference, -change
+
+    if first <= 0:
+        return 0
+
+    if step >= 0:
+        return None
+
+    return (first - step - 1) // -step
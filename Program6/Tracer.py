@@ -0,0 +1,208 @@
+from collections import deque
+from ControlFlow import FUSED
+from Summarizer import LOOP
+from Executor import UNDEFINED
+from Specializer import ASSIGN_OPCODES
+import bisect
+
+'''
+Responsible for tracing a BEEP program cheaply enough to leave on.
+The lines executed are kept in a fixed size ring buffer of recent
+events, each the step, the instruction and the values of its
+variable operands before it ran, instead of being printed. The
+buffer is written out when a line raises an error. Lines can be
+sampled, and traced only on given lines or under given labels.
+'''
+
+
+class Tracer:
+
+    DEFAULT_SIZE = 64       # events kept in the ring buffer
+
+    VALUE_WIDTH = 40        # characters of a value shown in the dump
+
+    '''
+    Constructor for Tracer
+
+    sampleEvery records one in every sampleEvery lines that pass the
+    filters. lines and labels restrict tracing to those line numbers
+    and to the lines under those labels, both None to trace every line
+    '''
+
+    def __init__(self, size=DEFAULT_SIZE, sampleEvery=1, lines=None, labels=None):
+
+        self.events = deque(maxlen=size)    # ring buffer of (step, instruction, operand values)
+
+        self.sampleEvery = sampleEvery      # lines passing the filters per line recorded
+
+        self.lines = set(lines) if lines != None else None      # line numbers traced, None for all
+
+        self.labels = list(labels) if labels != None else []    # labels whose lines are traced
+
+        self.seen = 0                       # lines that passed the filters
+
+        self.failed = False                 # True from a line raising an error until it is reported
+
+        self.executor = None                # executor being traced
+
+    '''
+        Purpose:
+            Traces every instruction the executor runs from now on.
+
+        Parameters:
+            executor  -  Executor to trace
+
+        Notes:
+            The executor's handlers are replaced by wrappers, so the
+            executor pays nothing when it is not traced. The lines of
+            a superinstruction are dispatched through the handlers, so
+            each of them is traced and superinstructions stay on. A
+            summarized loop only executes its IF, so every trip is
+            traced.
+            The trace is written after the error on a line is
+            reported, from the executor's onError.
+
+        Return:
+            Void
+    '''
+
+    def attach(self, executor):
+
+        self.executor = executor
+
+        if self.labels:
+            self.lines = (self.lines or set()) | self.labelLines(executor.labelD, len(executor.source))
+
+        handlers = executor.bindHandlers()
+
+        for opcode, handler in list(handlers.items()):
+
+            if opcode not in (FUSED, LOOP):
+                handlers[opcode] = self.traced(handler)
+
+        handlers[LOOP] = lambda instr: handlers[instr.header.opcode](instr.header)
+
+        executor.onError = self.dumpError
+
+    '''
+    Writes the trace after the error a traced line raised
+    '''
+
+    def dumpError(self):
+
+        if self.failed:
+            self.failed = False
+
+            self.dump(self.executor.out, "error")
+
+    '''
+    Lines under the labels traced, each label running to the
+    line before the next label
+    '''
+
+    def labelLines(self, labelD, numLines):
+
+        starts = sorted(labelD.values())
+
+        lines = set()
+
+        for name in self.labels:
+
+            start = labelD.get(name.upper(), None)
+
+            if start == None:
+                continue
+
+            index = bisect.bisect_right(starts, start)
+
+            end = starts[index] - 1 if index < len(starts) else numLines
+
+            lines.update(range(start, end + 1))
+
+        return lines
+
+    def traced(self, handler):
+
+        def tracedHandler(instr):
+
+            recorded = False
+
+            if self.lines == None or instr.lineNum in self.lines:
+                self.seen += 1
+
+                if self.seen % self.sampleEvery == 0:
+                    self.record(instr)
+
+                    recorded = True
+
+            try:
+                handler(instr)
+
+            # the failing line is always in the dump
+            except Exception:
+
+                if not recorded:
+                    self.record(instr)
+
+                self.failed = True
+
+                raise
+
+        return tracedHandler
+
+    '''
+    Appends an event for instr, dropping the oldest if the buffer is full
+    '''
+
+    def record(self, instr):
+
+        values = self.executor.values
+
+        # the values read, the target of an ASSIGN is not
+        args = instr.operands[1:] if instr.opcode in ASSIGN_OPCODES else instr.operands
+
+        operands = [(arg.text, values[arg.slot]) for arg in args if arg != None and arg.slot != None]
+
+        self.events.append((self.executor.execCount + 1, instr, operands))
+
+    '''
+    Formats a value for the dump, shortening long strings
+    '''
+
+    def formatValue(self, value):
+
+        if value is None or type(value) in (int, bool):
+            return str(value)
+
+        if value is UNDEFINED:
+            return "undefined"
+
+        text = str(value)
+
+        if len(text) > Tracer.VALUE_WIDTH:
+            text = text[:Tracer.VALUE_WIDTH] + "...(%d chars)" % (len(text))
+
+        return '"%s"' % (text)
+
+    '''
+        Purpose:
+            Writes the events in the ring buffer, oldest first.
+
+        Parameters:
+            out     -  Stream or OutputSink to write to
+            reason  -  Why the trace is written, shown in its heading
+
+        Return:
+            Void
+    '''
+
+    def dump(self, out, reason="request"):
+
+        out.write("*** trace of the last %d lines traced, on %s ***\n" % (len(self.events), reason))
+
+        out.write("%8s %6s  %-32s %s\n" % ("Step", "Line", "Statement", "Values"))
+
+        for step, instr, operands in self.events:
+            values = "  ".join("%s=%s" % (text, self.formatValue(value)) for text, value in operands)
+
+            out.write("%8d %6d  %-32s %s\n" % (step, instr.lineNum, instr.text.strip(), values))
@@ -0,0 +1,433 @@
+from p5Dict import declareVar
+from Executor import Executor
+from Compiler import Operand, compileToken, allocAssignSlots, resolveInstruction
+from Lexer import tokenize, declares
+import os, time, bisect, itertools
+
+'''
+Responsible for re-running a BEEP program each time its source
+file changes. The loaded program is kept in memory and an edit is
+applied to it in place: only the lines that changed are matched and
+decoded again, the label and VAR tables are rebuilt from the lines
+that define them and the lines after the edit are renumbered, so a
+re-run costs the size of the edit rather than the size of the file.
+'''
+
+POLL_INTERVAL = 0.25    # seconds between checks of the source file
+
+
+class WatchedProgram:
+
+    '''
+    Constructor for WatchedProgram
+
+    The program is given as loadProgram returns it, with the
+    token of each line
+    '''
+
+    def __init__(self, filename, varTypeD, varValueD, labelD, slotD, source, tokens, code):
+
+        self.filename = filename        # path of the BEEP source file
+
+        self.varTypeD = varTypeD        # dictionary for var data type
+
+        self.varValueD = varValueD      # dictionary for declared var value
+
+        self.labelD = labelD            # dictionary for labels
+
+        self.slotD = slotD              # dictionary for var slot, only ever extended
+
+        self.source = source            # source lines
+
+        self.tokens = tokens            # token of each source line
+
+        self.code = code                # decoded instructions, one per source line
+
+        # line numbers of the lines that define a label and that declare a variable
+        self.labelLines = [lineNum for lineNum, token in enumerate(tokens, 1) if token.group('label') != None]
+
+        self.varLines = [lineNum for lineNum, token in enumerate(tokens, 1) if declares(token)]
+
+        self.nameUses = {}      # dictionary of name to instructions with an operand of that name that is not a variable
+
+        self.labelUses = {}     # dictionary of label name to the instructions that branch to it
+
+        for instr in code:
+            self.index(instr)
+
+    '''
+    Records the operands of instr that would become variables if
+    their name were given a slot, and the label it branches to
+    '''
+
+    def index(self, instr):
+
+        for arg in instr.operands:
+
+            if arg != None and arg.slot == None:
+                self.nameUses.setdefault(arg.text.upper(), []).append(instr)
+
+        if instr.label != None:
+            self.labelUses.setdefault(instr.label.upper(), []).append(instr)
+
+    '''
+    True if instr is still the instruction of its line
+    '''
+
+    def live(self, instr):
+
+        return 0 < instr.lineNum <= len(self.code) and self.code[instr.lineNum - 1] is instr
+
+    '''
+        Purpose:
+            Applies an edit of the source to the program.
+
+        Parameters:
+            lines  -  Source lines as they are now
+            out    -  Stream or OutputSink for label errors
+
+        Notes:
+            The edit is the lines between the longest common prefix
+            and suffix of the old and new source. Only those lines
+            are tokenized and decoded. Instructions after the edit
+            keep their decoding and are renumbered; an instruction
+            is resolved again only if the edit gives one of its
+            names a slot or moves the label it branches to. The
+            label and VAR tables are rebuilt only if the edit
+            changes a line that defines a label or declares a
+            variable, and a label on more than one line is then
+            reported as loading reports it.
+            A variable the edit no longer declares or assigns keeps
+            its slot, which is never given a value.
+
+        Return:
+            (first, last) line numbers of the lines decoded again,
+            last is first - 1 if lines were only removed, or None
+            if the source has not changed
+    '''
+
+    def update(self, lines, out):
+
+        old = self.source
+
+        prefix = commonPrefix(old, lines)
+
+        suffix = commonSuffix(old, lines, prefix)
+
+        if prefix == len(old) == len(lines):
+            return None
+
+        oldEnd = len(old) - suffix      # index after the last line replaced
+
+        newEnd = len(lines) - suffix    # index after the last line inserted
+
+        delta = newEnd - oldEnd
+
+        numSlots = len(self.slotD)
+
+        newTokens = tokenize(lines[prefix:newEnd])
+
+        changedTokens = self.tokens[prefix:oldEnd] + newTokens
+
+        labelsChanged = any(token.group('label') != None for token in changedTokens)
+
+        varsChanged = any(declares(token) for token in changedTokens)
+
+        if delta != 0:
+
+            for instr in self.code[oldEnd:]:
+                instr.lineNum += delta
+
+        self.source = lines
+
+        self.tokens[prefix:oldEnd] = newTokens
+
+        self.labelLines = moveLines(self.labelLines, prefix, oldEnd, delta,
+                                    [prefix + index for index, token in enumerate(newTokens, 1)
+                                     if token.group('label') != None])
+
+        self.varLines = moveLines(self.varLines, prefix, oldEnd, delta,
+                                  [prefix + index for index, token in enumerate(newTokens, 1) if declares(token)])
+
+        oldLabelD = self.labelD
+
+        if labelsChanged:
+            self.buildLabels(out)
+
+        elif delta != 0:
+            self.labelD = {label: lineNum + delta if lineNum > oldEnd else lineNum
+                           for label, lineNum in oldLabelD.items()}
+
+        if varsChanged:
+            self.buildVars()
+
+        newCode = [compileToken(token, prefix + index, self.labelD) for index, token in enumerate(newTokens, 1)]
+
+        for instr in newCode:
+            allocAssignSlots(instr, self.slotD)
+
+        self.code[prefix:oldEnd] = newCode
+
+        # names the edit declares or assigns for the first time
+        for name in itertools.islice(self.slotD, numSlots, None):
+            self.resolveName(name)
+
+        for instr in newCode:
+            resolveInstruction(instr, self.slotD)
+
+            self.index(instr)
+
+        if labelsChanged or delta != 0:
+
+            for label in oldLabelD.keys() | self.labelD.keys():
+
+                if oldLabelD.get(label, None) != self.labelD.get(label, None):
+                    self.retarget(label)
+
+        return prefix + 1, newEnd
+
+    '''
+    Rebuilds labelD from the lines that define labels, in line
+    order as loading does
+    '''
+
+    def buildLabels(self, out):
+
+        labelD = {}
+
+        for lineNum in self.labelLines:
+
+            label = self.tokens[lineNum - 1].group('label').upper()
+
+            if labelD.get(label, None) != None:
+                out.write("***Error: label '%s' appears on multiple lines: %d and %d\n" % (label, labelD[label], lineNum))
+
+            else:
+                labelD[label] = lineNum
+
+        self.labelD = labelD
+
+    '''
+    Rebuilds the VAR table from the lines that declare variables,
+    a later declaration of a variable replacing an earlier one
+    '''
+
+    def buildVars(self):
+
+        varTypeD = {}
+
+        varValueD = {}
+
+        for lineNum in self.varLines:
+            declareVar(self.tokens[lineNum - 1], varTypeD, varValueD, self.slotD)
+
+        self.varTypeD = varTypeD
+
+        self.varValueD = varValueD
+
+    '''
+    Gives the operands named name in the instructions kept
+    from before the edit the slot name now has
+    '''
+
+    def resolveName(self, name):
+
+        slot = self.slotD[name]
+
+        for instr in self.nameUses.pop(name, ()):
+
+            if self.live(instr):
+                instr.operands = tuple(Operand(arg.text, slot, arg.const)
+                                       if arg != None and arg.slot == None and arg.text.upper() == name else arg
+                                       for arg in instr.operands)
+
+    '''
+    Resolves the branches to label to the line it is now on
+    '''
+
+    def retarget(self, label):
+
+        target = self.labelD.get(label, None)
+
+        uses = [instr for instr in self.labelUses.get(label, ()) if self.live(instr)]
+
+        for instr in uses:
+            instr.target = target
+
+        self.labelUses[label] = uses
+
+    '''
+        Purpose:
+            Runs the program as it is now.
+
+        Parameters:
+            out      -  Stream or OutputSink for the program output
+            verbose  -  Print each line as it is executed
+
+        Notes:
+            Constants are not folded and superinstructions are not
+            built, since both cover the whole program and would cost
+            more than the edit.
+
+        Return:
+            Executor that ran the program
+    '''
+
+    def run(self, out, verbose=False):
+
+        executor = Executor(self.varTypeD, dict(self.varValueD), self.labelD, self.source, self.slotD, out,
+                            list(self.code))
+
+        executor.folding = False
+
+        executor.fusion = False
+
+        executor.execute(self.source, verbose)
+
+        return executor
+
+
+'''
+Number of lines at the start of old and new that are the same,
+found by comparing halves of the remaining lines as lists
+'''
+def commonPrefix(old, new):
+
+    low = 0
+
+    high = min(len(old), len(new))
+
+    while low < high:
+        middle = (low + high + 1) // 2
+
+        if old[low:middle] == new[low:middle]:
+            low = middle
+
+        else:
+            high = middle - 1
+
+    return low
+
+
+'''
+Number of lines at the end of old and new that are the same,
+not counting the prefix lines already matched
+'''
+def commonSuffix(old, new, prefix):
+
+    low = 0
+
+    high = min(len(old), len(new)) - prefix
+
+    while low < high:
+        middle = (low + high + 1) // 2
+
+        if old[len(old) - middle:len(old) - low] == new[len(new) - middle:len(new) - low]:
+            low = middle
+
+        else:
+            high = middle - 1
+
+    return low
+
+
+'''
+    Purpose:
+        Moves a sorted list of line numbers past an edit.
+
+    Parameters:
+        lineNums  -  Sorted list of line numbers
+        prefix    -  Lines before the edit
+        oldEnd    -  Line number of the last line the edit replaced
+        delta     -  Lines the edit added, negative if it removed lines
+        added     -  Sorted line numbers within the edit to insert
+
+    Return:
+        Sorted list of line numbers
+'''
+def moveLines(lineNums, prefix, oldEnd, delta, added):
+
+    start = bisect.bisect_right(lineNums, prefix)
+
+    end = bisect.bisect_right(lineNums, oldEnd)
+
+    return lineNums[:start] + added + [lineNum + delta for lineNum in lineNums[end:]]
+
+
+'''
+Modification time and size of the file at path, None if it cannot be read
+'''
+def fileStamp(path):
+
+    try:
+        stat = os.stat(path)
+
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+'''
+    Purpose:
+        Re-runs a program each time its source file changes.
+
+    Parameters:
+        program   -  WatchedProgram, already run once
+        out       -  Stream or OutputSink for the program output
+        verbose   -  Print each line as it is executed
+        interval  -  Seconds between checks of the file
+
+    Notes:
+        Returns only when interrupted. A file that cannot be read,
+        as while an editor replaces it, is checked again later.
+
+    Return:
+        Void
+'''
+def watchProgram(program, out, verbose=False, interval=POLL_INTERVAL):
+
+    stamp = fileStamp(program.filename)
+
+    while True:
+
+        time.sleep(interval)
+
+        newStamp = fileStamp(program.filename)
+
+        if newStamp == None or newStamp == stamp:
+            continue
+
+        try:
+            file = open(program.filename, "r", encoding='latin-1')
+
+            try:
+                lines = file.readlines()
+
+            finally:
+                file.close()
+
+        except OSError:
+            continue
+
+        stamp = newStamp
+
+        changed = program.update(lines, out)
+
+        if changed == None:
+            continue
+
+        first, last = changed
+
+        if last < first:
+            out.write("*** %s changed, lines removed before line %d ***\n" % (program.filename, first))
+
+        else:
+            out.write("*** %s changed, lines %d-%d recompiled ***\n" % (program.filename, first, last))
+
+        executor = program.run(out, verbose)
+
+        if executor.limitReached():
+            out.write("Infinite loop most likely encountered\n")
+
+            out.flush()
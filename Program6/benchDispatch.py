@@ -0,0 +1,202 @@
+from Compiler import compileSource, BLANK, ASSIGN
+from Executor import Executor
+import re, sys, io, time, contextlib
+
+'''
+Micro-benchmark of the per-instruction dispatch cost of the
+Executor, before and after instructions were dispatched through
+the opcode and operator tables.
+
+Usage: benchDispatch.py [iterations]
+'''
+
+# statement regular expressions execute tried in this order before
+# lines were decoded, kept only to time that cascade
+assignRE = re.compile(r'\s*ASSIGN\s+(\w+)\s+([+\-*&>=<%]+)?\s*(\w+)\s*(\w+)?$')
+printRE  = re.compile(r'\s*[\w:]*\s*PRINT\s+(.*)$')
+gotoRE   = re.compile(r'\s*[\w:]*\s*GOTO\s+(\w+)$')
+ifRE     = re.compile(r'\s*([\w\W]*)[Ii][fF]\s+(([><=]+)\s+(\w+)\s(\w+))\s(\w+)$')
+
+# body of the loop in p6InputL.txt, the lines executed on every iteration
+LOOP_BODY = [
+    'Loop: if >= count iter endloop\n',
+    '    PRINT "Top:...count=" count "tick=" tick "symbol=" symbol\n',
+    '    ASSIGN count + count 1\n',
+    '    IF > tick limit pastlimit\n',
+    '        ASSIGN result * symbol tick\n',
+    '        PRINT result\n',
+    '        ASSIGN tick + tick 1\n',
+    '        GOTO afterIf\n',
+    '    afterIf: GOTO loop\n',
+]
+
+
+'''
+    Purpose:
+        Builds a p6InputL.txt style counted loop.
+
+    Parameters:
+        iterations  -  Number of times the loop body executes
+
+    Notes:
+        limit is set so that the replicate branch is never taken
+        and the result string stays short.
+
+    Return:
+        List of source lines
+'''
+def loopProgram(iterations):
+
+    return [
+        'VAR int count 0\n',
+        'VAR string result\n',
+        'VAR string symbol "ho"\n',
+        'VAR int tick 0\n',
+        'VAR int limit 0\n',
+        'VAR int iter %d\n' % (iterations),
+        'Loop: if >= count iter endloop\n',
+        '    ASSIGN count + count 1\n',
+        '    IF > tick limit pastlimit\n',
+        '        ASSIGN result * symbol tick\n',
+        '        GOTO afterIf\n',
+        '    pastlimit: ASSIGN tick - tick 1\n',
+        '    afterIf: GOTO loop\n',
+        'endloop: PRINT "EndLoop"\n',
+    ]
+
+
+'''
+    Purpose:
+        Dispatches a line the way execute did before the tables:
+        the statement regexes are tried in order on the source text,
+        then the ASSIGN operator is found by an if/elif chain.
+
+    Return:
+        Name of the action that would run
+'''
+def cascadeDispatch(line):
+
+    assignMO = assignRE.match(line)
+
+    if assignMO != None:
+        op = assignMO.group(2)
+
+        if op == '*':
+            return 'replicate'
+        elif op == '+':
+            return 'add'
+        elif op == '-':
+            return 'subtract'
+        elif op == '>':
+            return 'greater'
+        elif op == '>=':
+            return 'greaterEqual'
+        elif op == '&':
+            return 'concat'
+
+        return 'assign'
+
+    elif printRE.match(line) != None:
+        return 'print'
+
+    elif gotoRE.match(line) != None:
+        return 'goto'
+
+    elif ifRE.match(line) != None:
+        return 'if'
+
+    return 'nop'
+
+
+'''
+    Purpose:
+        Dispatches a decoded instruction through the opcode and
+        operator tables the way execute does now.
+
+    Return:
+        Handler that would run
+'''
+def tableDispatch(instr, handlers, assignOps):
+
+    handler = handlers[instr.opcode]
+
+    if instr.opcode == ASSIGN and instr.op != None:
+        return assignOps[instr.op]
+
+    return handler
+
+
+'''
+    Purpose:
+        Times the executor end to end on the generated loop.
+
+    Return:
+        Tuple of lines executed and seconds taken
+'''
+def timeExecute(iterations):
+
+    source = loopProgram(iterations)
+
+    executor = Executor({}, {'COUNT': 0, 'RESULT': '', 'SYMBOL': 'ho', 'TICK': 0, 'LIMIT': 0, 'ITER': iterations},
+                        {'LOOP': 7, 'PASTLIMIT': 12, 'AFTERIF': 13, 'ENDLOOP': 14}, source)
+
+    executor.executionLimit = None
+
+    # every line is dispatched, the loop is not applied in one step
+    executor.summarizing = False
+
+    start = time.perf_counter()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        executor.execute(source)
+
+    elapsed = time.perf_counter() - start
+
+    return executor.execCount, elapsed
+
+
+def main(argv):
+
+    iterations = int(argv[1]) if len(argv) > 1 else 20000
+
+    labelD = {'LOOP': 1, 'PASTLIMIT': 9, 'AFTERIF': 9, 'ENDLOOP': 9}
+
+    code = [instr for instr in compileSource(LOOP_BODY, labelD) if instr.opcode != BLANK]
+
+    executor = Executor({}, {}, labelD, LOOP_BODY)
+
+    steps = iterations * len(code)
+
+    start = time.perf_counter()
+
+    for i in range(iterations):
+        for instr in code:
+            cascadeDispatch(instr.text)
+
+    before = time.perf_counter() - start
+
+    handlers = executor.bindHandlers()
+
+    assignOps = Executor.ASSIGN_OPS
+
+    start = time.perf_counter()
+
+    for i in range(iterations):
+        for instr in code:
+            tableDispatch(instr, handlers, assignOps)
+
+    after = time.perf_counter() - start
+
+    print("dispatch of %d instructions" % (steps))
+    print("    %-22s %8.1f ns/instruction" % ("regex cascade:", before / steps * 1e9))
+    print("    %-22s %8.1f ns/instruction" % ("opcode table:", after / steps * 1e9))
+
+    execCount, elapsed = timeExecute(iterations)
+
+    print("execute on p6InputL.txt style loop")
+    print("    %-22s %8d" % ("lines executed:", execCount))
+    print("    %-22s %8.1f ns/line" % ("total:", elapsed / execCount * 1e9))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,347 @@
+from p6Driver import loadProgram
+from Executor import Executor
+from FastTier import FastExecutor
+from OutputSink import OutputSink
+import sys, os, time, json, tempfile, tracemalloc
+
+'''
+Benchmark suite for the interpreter. Each workload is a generated
+BEEP program that stresses one part of the interpreter: loading a
+large source, dispatching a tight IF/GOTO loop, building strings
+with * and &, and printing. Results are compared against the
+baseline stored for the same scale and executor tier so that
+regressions are caught; a baseline file holds one set of results
+for each scale and tier saved.
+
+Usage: benchSuite.py [--baseline=<file>] [--save] [--repeat=<n>] [--scale=<factor>] [--tolerance=<fraction>] [--fast]
+'''
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchBaseline.json')
+
+
+'''
+    Purpose:
+        Generates a large straight-line source, mostly comments,
+        declarations and arithmetic, to measure loading.
+
+    Parameters:
+        scale  -  Multiplier of the workload size
+
+    Return:
+        List of source lines
+'''
+def loadWorkload(scale):
+
+    source = ['VAR int count 0\n']
+
+    for i in range(int(20000 * scale)):
+        source.append('# generated line %d\n' % (i))
+        source.append('VAR int v%d %d\n' % (i, i))
+        source.append('L%d: ASSIGN count + count 1\n' % (i))
+
+    source.append('PRINT "count=" count\n')
+
+    return source
+
+
+'''
+    Purpose:
+        Generates a tight counted loop of IF, ASSIGN and GOTO.
+
+    Return:
+        List of source lines
+'''
+def dispatchWorkload(scale):
+
+    return [
+        'VAR int count 0\n',
+        'VAR int other 0\n',
+        'VAR int iter %d\n' % (int(50000 * scale)),
+        'loop: if >= count iter done\n',
+        '    ASSIGN count + count 1\n',
+        '    IF > count other skip\n',
+        '    ASSIGN other + other 2\n',
+        '    skip: GOTO loop\n',
+        'done: PRINT "count=" count\n',
+    ]
+
+
+'''
+    Purpose:
+        Generates a loop that builds strings with * and &.
+
+    Return:
+        List of source lines
+'''
+def stringWorkload(scale):
+
+    return [
+        'VAR int count 0\n',
+        'VAR int iter %d\n' % (int(5000 * scale)),
+        'VAR string piece "ab"\n',
+        'VAR string result\n',
+        'VAR string block\n',
+        'loop: if >= count iter done\n',
+        '    ASSIGN block * piece 8\n',
+        '    ASSIGN result & result block\n',
+        '    ASSIGN count + count 1\n',
+        '    GOTO loop\n',
+        'done: PRINT "built" count\n',
+    ]
+
+
+'''
+    Purpose:
+        Generates a loop dominated by PRINT.
+
+    Return:
+        List of source lines
+'''
+def printWorkload(scale):
+
+    return [
+        'VAR int count 0\n',
+        'VAR int iter %d\n' % (int(20000 * scale)),
+        'VAR string label "value="\n',
+        'loop: if >= count iter done\n',
+        '    PRINT label count "of" iter\n',
+        '    PRINT "tick"\n',
+        '    ASSIGN count + count 1\n',
+        '    GOTO loop\n',
+        'done: PRINT "EndPgm"\n',
+    ]
+
+
+WORKLOADS = [
+    ('load', loadWorkload),
+    ('dispatch', dispatchWorkload),
+    ('strings', stringWorkload),
+    ('print', printWorkload),
+]
+
+
+'''
+    Purpose:
+        Loads and runs a source file once.
+
+    Parameters:
+        filename       -  Source file holding the workload
+        executorClass  -  Executor or FastExecutor
+
+    Return:
+        Tuple of startup seconds, execution seconds and lines executed
+'''
+def runOnce(filename, executorClass=Executor):
+
+    out = OutputSink(capture=True)
+
+    start = time.perf_counter()
+
+    varTypeD, varValueD, labelD, slotD, source, code = loadProgram(filename, out, echo=False)
+
+    loaded = time.perf_counter()
+
+    executor = executorClass(varTypeD, varValueD, labelD, source, slotD, out, code)
+
+    executor.executionLimit = None
+
+    # the workloads measure the lines they are made of, not a summary of their loops
+    executor.summarizing = False
+
+    executor.execute(source)
+
+    return loaded - start, time.perf_counter() - loaded, executor.execCount
+
+
+'''
+    Purpose:
+        Measures one workload.
+
+    Parameters:
+        filename       -  Source file holding the workload
+        repeat         -  Number of timed runs, the fastest is kept
+        executorClass  -  Executor or FastExecutor
+
+    Notes:
+        Peak memory is measured in a separate run since tracing
+        allocations slows the interpreter down.
+
+    Return:
+        Dictionary of the workload's metrics
+'''
+def measure(filename, repeat, executorClass=Executor):
+
+    runs = [runOnce(filename, executorClass) for i in range(repeat)]
+
+    startup = min(run[0] for run in runs)
+
+    seconds = min(run[1] for run in runs)
+
+    execCount = runs[0][2]
+
+    tracemalloc.start()
+
+    runOnce(filename, executorClass)
+
+    peak = tracemalloc.get_traced_memory()[1]
+
+    tracemalloc.stop()
+
+    return {
+        "startup": startup,
+        "seconds": seconds,
+        "lines": execCount,
+        "ips": execCount / seconds if seconds > 0 else 0.0,
+        "peakKB": peak / 1024.0,
+    }
+
+
+'''
+Key of the baseline results for a scale and tier in the baseline file
+'''
+def baselineKey(scale, tier):
+
+    return "%s, scale %g" % (tier, scale)
+
+
+'''
+    Purpose:
+        Compares results with the baseline.
+
+    Parameters:
+        results    -  Dictionary of workload name to metrics
+        baseline   -  Dictionary of workload name to metrics
+        tolerance  -  Fraction a metric may get worse before it
+                      is reported as a regression
+
+    Return:
+        List of regression messages
+'''
+def compare(results, baseline, tolerance):
+
+    regressions = []
+
+    for name, metrics in results.items():
+
+        base = baseline.get(name, None)
+
+        if base == None:
+            continue
+
+        if metrics["ips"] < base["ips"] * (1.0 - tolerance):
+            regressions.append("%s: %.0f instructions/s, baseline %.0f" % (name, metrics["ips"], base["ips"]))
+
+        # differences below the floor are measurement noise
+        for key, unit, floor in (("startup", "s", 0.001), ("peakKB", "KB", 64.0)):
+
+            if metrics[key] > base[key] * (1.0 + tolerance) + floor:
+                regressions.append("%s: %s %.4f %s, baseline %.4f %s" % (name, key, metrics[key], unit, base[key], unit))
+
+    return regressions
+
+
+def main(argv):
+
+    baselineFile = DEFAULT_BASELINE
+
+    save = False
+
+    repeat = 3
+
+    scale = 1.0
+
+    tolerance = 0.2
+
+    executorClass = Executor
+
+    tier = 'interpreter'
+
+    for arg in argv[1:]:
+
+        if arg.startswith('--baseline='):
+            baselineFile = arg[11:]
+
+        elif arg == '--save':
+            save = True
+
+        elif arg.startswith('--repeat='):
+            repeat = int(arg[9:])
+
+        elif arg.startswith('--scale='):
+            scale = float(arg[8:])
+
+        elif arg.startswith('--tolerance='):
+            tolerance = float(arg[12:])
+
+        elif arg == '--fast':
+            executorClass = FastExecutor
+
+            tier = 'fast'
+
+        else:
+            print("Usage: %s [--baseline=<file>] [--save] [--repeat=<n>] [--scale=<factor>] [--tolerance=<fraction>] [--fast]" % (argv[0]))
+
+            return 1
+
+    storedD = {}    # dictionary of baselineKey to the scale, tier and workload metrics saved
+
+    if os.path.isfile(baselineFile):
+
+        with open(baselineFile) as file:
+            storedD = json.load(file)
+
+    key = baselineKey(scale, tier)
+
+    stored = storedD.get(key, None)
+
+    baseline = stored["workloads"] if stored != None else {}
+
+    results = {}
+
+    print("%-10s %10s %10s %10s %14s %10s %8s" % ("Workload", "Lines", "Startup", "Seconds", "Instr/s", "Peak KB", "vs base"))
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        for name, workload in WORKLOADS:
+
+            filename = os.path.join(directory, name + '.txt')
+
+            with open(filename, 'w') as file:
+                file.writelines(workload(scale))
+
+            metrics = results[name] = measure(filename, repeat, executorClass)
+
+            base = baseline.get(name, None)
+
+            ratio = "%7.2fx" % (metrics["ips"] / base["ips"]) if base != None and base["ips"] > 0 else "-"
+
+            print("%-10s %10d %10.4f %10.4f %14.0f %10.1f %8s" % (name, metrics["lines"], metrics["startup"],
+                                                                  metrics["seconds"], metrics["ips"],
+                                                                  metrics["peakKB"], ratio))
+
+    if save:
+        storedD[key] = {"scale": scale, "tier": tier, "workloads": results}
+
+        with open(baselineFile, 'w') as file:
+            json.dump(storedD, file, indent=2)
+
+        print("baseline for %s saved to %s" % (key, baselineFile))
+
+        return 0
+
+    # results at another scale or from another tier are not comparable
+    if stored == None:
+        print("no baseline for %s in %s, results not compared" % (key, baselineFile))
+
+        return 0
+
+    regressions = compare(results, baseline, tolerance)
+
+    for message in regressions:
+        print("REGRESSION %s" % (message))
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
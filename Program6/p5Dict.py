@@ -1,3 +1,5 @@
+import sys
+
 '''
     Purpose:
         stores a variable's value and type in a dictionary
@@ -6,11 +8,13 @@
         tokenM    -  Match object that contains a variable's type, name, and value.
         varTypeD  -  Dictionary with mapping of var name to data type
         varValueD -  Dictionary with mapping of var name to value
+        slotD     -  Dictionary with mapping of var name to slot.
+                     A new variable is given the next free slot
 
     Return:
         Void
 '''
-def declareVar(tokenMO, varTypeD, varValueD):
+def declareVar(tokenMO, varTypeD, varValueD, slotD=None):
 
     try:
         varType = tokenMO.group(1).upper()
@@ -21,6 +25,9 @@ def declareVar(tokenMO, varTypeD, varValueD):
 
         varTypeD[varName] = varType
 
+        if slotD != None and slotD.get(varName, None) == None:
+            slotD[varName] = len(slotD)
+
         if varType == 'INT':
 
             varValueD[varName] = int(varValue)
@@ -45,6 +52,7 @@ def declareVar(tokenMO, varTypeD, varValueD):
     Parameters:
         varTypeD  -  Dictionary with mapping of var name to data type
         varValueD -  Dictionary with mapping of var name to value
+        out       -  Stream or OutputSink to print to, standard output if None
 
     Notes:
         Sorts keys in the varTypeD and varValueD dictionaries
@@ -53,13 +61,15 @@ def declareVar(tokenMO, varTypeD, varValueD):
     Return:
         Void
 '''
-def printVariables(varTypeD, varValueD):
-    print("Variables:")
+def printVariables(varTypeD, varValueD, out=None):
+    out = out if out != None else sys.stdout
 
-    print("%12s %8s %8s" % ("Variable", "Type", "Value"))
+    out.write("Variables:\n")
+
+    out.write("%12s %8s %8s\n" % ("Variable", "Type", "Value"))
 
     for name in sorted(varTypeD):
-        print("    %-10s   %-8s %-8s" % (name, varTypeD[name], varValueD[name]))
+        out.write("    %-10s   %-8s %-8s\n" % (name, varTypeD[name], varValueD[name]))
 
 
 '''
@@ -68,6 +78,7 @@ def printVariables(varTypeD, varValueD):
 
     Parameters:
         labelD  -  Dictionary with mapping of label name to line number
+        out     -  Stream or OutputSink to print to, standard output if None
 
     Notes:
         Sorts keys in the labelD dictionary in ascending order.
@@ -75,11 +86,13 @@ def printVariables(varTypeD, varValueD):
     Return:
         Void
 '''
-def printLabels(labelD):
-    print("Labels:")
+def printLabels(labelD, out=None):
+    out = out if out != None else sys.stdout
+
+    out.write("Labels:\n")
 
-    print("%9s %16s" % ("Label", "Statement"))
+    out.write("%9s %16s\n" % ("Label", "Statement"))
 
     for name in sorted(labelD):
-        print("    %-10s   %-8s" % (name, labelD[name]))
+        out.write("    %-10s   %-8s\n" % (name, labelD[name]))
 
@@ -0,0 +1,339 @@
+from p6Driver import loadProgram
+from ProgramCache import ProgramCache
+from Executor import Executor
+from OutputSink import OutputSink
+from Checker import checkProgram, errors
+import sys, os, time, fnmatch, multiprocessing
+
+'''
+Runs many BEEP programs in parallel, one program at a time in each
+worker process, and prints a summary of how each program ended.
+'''
+
+# status of a program in the summary report
+OK      = 'ok'          # ran to the end of the source
+ERROR   = 'error'       # stopped on a line error
+LIMIT   = 'limit'       # reached the step limit or time limit
+TIMEOUT = 'timeout'     # did not finish within the timeout
+CRASH   = 'crash'       # the interpreter raised an exception
+REJECTED = 'rejected'   # not run, the checker found an endless loop or a type error
+
+
+class BatchResult:
+
+    '''
+    Constructor for BatchResult
+    '''
+
+    def __init__(self, filename, status, output="", execCount=0, seconds=0.0, message=None):
+
+        self.filename = filename    # path of the BEEP source
+
+        self.status = status        # how the program ended
+
+        self.output = output        # everything the program printed
+
+        self.execCount = execCount  # count of lines executed
+
+        self.seconds = seconds      # wall clock time to load and run
+
+        self.message = message      # error message, if any
+
+    '''
+    Exit status of the program, 0 only if it ran to the end
+    '''
+
+    def exitStatus(self):
+
+        return 0 if self.status == OK else 1
+
+
+'''
+    Purpose:
+        Loads and runs one BEEP program in the worker process.
+
+    Parameters:
+        filename   -  Path of the BEEP source
+        stepLimit  -  Lines executed before the program is stopped
+        timeLimit  -  Seconds the program may run, None for no limit
+        cacheDir   -  Directory of the ProgramCache, None to not cache
+        check      -  Check the program first and do not run it if
+                      the checker reports an error
+
+    Notes:
+        Every program gets its own Executor and captured output,
+        nothing is shared between programs run by the same worker.
+        The checker's diagnostics are part of the output.
+
+    Return:
+        BatchResult
+'''
+def runProgram(filename, stepLimit, timeLimit=None, cacheDir=None, check=False):
+
+    start = time.perf_counter()
+
+    out = OutputSink(capture=True)
+
+    executor = None
+
+    try:
+        cache = ProgramCache(cacheDir) if cacheDir != None else None
+
+        varTypeD, varValueD, labelD, slotD, source, code = loadProgram(filename, out, False, cache)
+
+        executor = Executor(varTypeD, varValueD, labelD, source, slotD, out, code)
+
+        executor.executionLimit = stepLimit
+
+        if check:
+            diagnostics = checkProgram(executor.compile(), labelD, varValueD, executor.slotD)
+
+            for diagnostic in diagnostics:
+                out.write("%s\n" % (diagnostic))
+
+            if errors(diagnostics):
+                return BatchResult(filename, REJECTED, out.getvalue(), 0, time.perf_counter() - start,
+                                   str(errors(diagnostics)[0]))
+
+        state = executor.execute(source, timeBudget=timeLimit)
+
+        status = ERROR if executor.error != None else OK
+
+        message = executor.error
+
+        if state == Executor.SUSPENDED:
+            status = LIMIT
+
+            if executor.limitReached():
+                message = "step limit of %d reached" % (stepLimit)
+
+            else:
+                message = "time limit of %.1f seconds reached" % (timeLimit)
+
+    except Exception as e:
+        status = CRASH
+
+        message = "%s: %s" % (type(e).__name__, e)
+
+    execCount = executor.execCount if executor != None else 0
+
+    return BatchResult(filename, status, out.getvalue(), execCount, time.perf_counter() - start, message)
+
+
+'''
+    Purpose:
+        Expands the command line paths into a list of BEEP sources.
+
+    Parameters:
+        paths    -  Files and directories
+        pattern  -  Pattern of file names to run from a directory
+
+    Return:
+        List of file paths
+'''
+def findPrograms(paths, pattern):
+
+    programs = []
+
+    for path in paths:
+
+        if os.path.isdir(path):
+
+            for name in sorted(os.listdir(path)):
+
+                filename = os.path.join(path, name)
+
+                if os.path.isfile(filename) and fnmatch.fnmatch(name, pattern):
+                    programs.append(filename)
+
+        else:
+            programs.append(path)
+
+    return programs
+
+
+'''
+    Purpose:
+        Runs the programs across a pool of worker processes.
+
+    Parameters:
+        programs   -  List of BEEP source paths
+        workers    -  Number of worker processes
+        stepLimit  -  Lines executed before a program is stopped
+        timeout    -  Seconds the whole batch may take, None to wait forever
+        timeLimit  -  Seconds each program may run, None for no limit
+        cacheDir   -  Directory of the ProgramCache, None to not cache
+        check      -  Check each program before running it
+
+    Notes:
+        A program without a result when the timeout expires is
+        reported as a timeout and its worker is terminated, so a
+        runaway program cannot hold up the report.
+
+    Return:
+        List of BatchResult in the order of programs
+'''
+def runBatch(programs, workers, stepLimit, timeout=None, timeLimit=None, cacheDir=None, check=False):
+
+    results = []
+
+    pool = multiprocessing.Pool(workers)
+
+    try:
+        pending = [pool.apply_async(runProgram, (filename, stepLimit, timeLimit, cacheDir, check)) for filename in programs]
+
+        pool.close()
+
+        deadline = time.perf_counter() + timeout if timeout != None else None
+
+        for filename, asyncResult in zip(programs, pending):
+
+            wait = max(0.0, deadline - time.perf_counter()) if deadline != None else None
+
+            try:
+                results.append(asyncResult.get(wait))
+
+            except multiprocessing.TimeoutError:
+                results.append(BatchResult(filename, TIMEOUT, message="no result after %.1f seconds" % (timeout)))
+
+    finally:
+        pool.terminate()
+
+        pool.join()
+
+    return results
+
+
+'''
+    Purpose:
+        Prints the output of each program and the summary report.
+
+    Parameters:
+        results     -  List of BatchResult
+        showOutput  -  Print what each program printed
+        out         -  Stream to print to
+'''
+def printReport(results, showOutput, out):
+
+    if showOutput:
+
+        for result in results:
+            out.write("==> %s <==\n" % (result.filename))
+            out.write(result.output)
+
+    out.write("%-30s %-8s %4s %8s %10s\n" % ("Program", "Status", "Exit", "Lines", "Seconds"))
+
+    for result in results:
+        out.write("%-30s %-8s %4d %8d %10.4f\n" % (result.filename, result.status, result.exitStatus(),
+                                                    result.execCount, result.seconds))
+
+        if result.message != None:
+            out.write("    %s\n" % (result.message))
+
+    failed = sum(1 for result in results if result.exitStatus() != 0)
+
+    out.write("%d programs, %d succeeded, %d failed, %d lines executed\n" % (
+        len(results), len(results) - failed, failed, sum(result.execCount for result in results)))
+
+
+'''
+    Purpose:
+        Runs a batch of BEEP programs and prints the summary report.
+
+    Parameters:
+        argv  -  Command line arguments
+
+    Notes:
+        Main must be called with the following arguments:
+        p6Batch.py <directory or BEEP source>... [--workers=<n>] [--steps=<n>] [--time=<seconds>]
+                   [--timeout=<seconds>] [--pattern=<glob>] [--show-output] [--cache[=<dir>]] [--check]
+
+        --workers defaults to the number of cores, --steps to
+        Executor.EXECUTION_LIMIT and --pattern to *.txt.
+        --time limits the wall clock time of each program and
+        --timeout the wall clock time of the whole batch.
+        --cache loads the programs through a ProgramCache
+        --check does not run a program the checker finds an
+        endless loop or a type error in
+
+    Return:
+        Exit status, 0 only if every program ran to the end
+'''
+def main(argv):
+
+    workers = os.cpu_count() or 1
+
+    stepLimit = Executor.EXECUTION_LIMIT
+
+    timeout = None
+
+    timeLimit = None
+
+    pattern = '*.txt'
+
+    showOutput = False
+
+    cacheDir = None
+
+    check = False
+
+    paths = []
+
+    usage = ("Usage: %s <directory or BEEP source>... [--workers=<n>] [--steps=<n>] [--time=<seconds>] "
+             "[--timeout=<seconds>] [--pattern=<glob>] [--show-output] [--cache[=<dir>]] [--check]" % (argv[0]))
+
+    try:
+        for arg in argv[1:]:
+
+            if arg.startswith('--workers='):
+                workers = int(arg[10:])
+
+            elif arg.startswith('--steps='):
+                stepLimit = int(arg[8:])
+
+            elif arg.startswith('--time='):
+                timeLimit = float(arg[7:])
+
+            elif arg.startswith('--timeout='):
+                timeout = float(arg[10:])
+
+            elif arg.startswith('--pattern='):
+                pattern = arg[10:]
+
+            elif arg == '--show-output':
+                showOutput = True
+
+            elif arg == '--cache':
+                cacheDir = ProgramCache.DEFAULT_DIRECTORY
+
+            elif arg.startswith('--cache='):
+                cacheDir = arg[8:]
+
+            elif arg == '--check':
+                check = True
+
+            elif arg.startswith('--'):
+                raise ValueError(arg)
+
+            else:
+                paths.append(arg)
+
+    except ValueError:
+        paths = []
+
+    if len(paths) == 0 or workers < 1:
+        print(usage)
+
+        return 1
+
+    programs = findPrograms(paths, pattern)
+
+    results = runBatch(programs, workers, stepLimit, timeout, timeLimit, cacheDir, check)
+
+    printReport(results, showOutput, sys.stdout)
+
+    return 0 if all(result.exitStatus() == 0 for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,6 +1,17 @@
 from p5Dict import declareVar, printLabels, printVariables
 from Executor import Executor
-import sys, os, re
+from OutputSink import OutputSink
+from ProgramCache import ProgramCache
+from StreamLoader import streamProgram
+from Profiler import Profiler
+from Tracer import Tracer
+from FastTier import FastExecutor
+from Checker import checkProgram, errors
+from Snapshot import executeWithSnapshots, DEFAULT_INTERVAL
+from Watcher import WatchedProgram, watchProgram
+from Compiler import compileSource
+from Lexer import tokenize, declares
+import sys, os, io, gc, contextlib
 
 
 '''                                                                      
@@ -14,108 +25,536 @@ import sys, os, re
 
     Notes:                                                                            
         Main must be called with the following arguments:
-        p6Driver.py <BEEP source> [-v]
+        p6Driver.py <BEEP source> [-v] [--compile-only] [--check] [--buffer=<size>] [--output=<file>]
+                    [--cache[=<dir>] | --stream] [--profile[=<json file>]] [--fast[=<lines>]]
+                    [--snapshot=<file> [--snapshot-interval=<lines>]]
+                    [--trace[=<size>] [--trace-every=<n>] [--trace-only=<lines and labels>]]
+        p6Driver.py <BEEP source> --watch [-v] [--buffer=<size>] [--output=<file>]
+
+        --compile-only decodes the source and reports undefined
+        labels, unreachable lines, endless loops and type errors
+        without executing it
+        --check reports the same before executing the source, and
+        does not execute it if it has an endless loop or a type error
+        --buffer sets the number of characters of output buffered
+        before it is written, 0 writes every line immediately
+        --output writes the output to file instead of standard output
+        --cache loads the program from the cache in dir, or the
+        default cache directory, and caches it if it is not there
+        --stream memory maps the source and decodes each line when it
+        is first executed; the source is not listed
+        --profile prints the hot lines, labels, opcodes and IF
+        outcomes after execution, and writes them to json file
+        --fast translates the program into Python once it has
+        executed lines lines, by default a number that grows with
+        the length of the source; ignored with -v, --stream and
+        --profile
+        --snapshot resumes execution from the snapshot in file if
+        there is one, and writes a snapshot to it every lines lines,
+        100000 by default, until the program ends
+        --trace keeps the last size lines executed, 64 by default,
+        with the values of their variables, and prints them when a
+        line has an error or execution reaches the limit
+        --trace-every keeps one line in every n
+        --trace-only keeps only the lines in a comma separated list
+        of line numbers, ranges such as 10-20 and labels
+        --watch executes the source, then executes it again each
+        time the file changes, decoding only the lines that changed,
+        until interrupted
                        
     Return:                                                              
 '''
 
 def main(argv):
 
-    varTypeD  = {}  # dictionary for variable types
+    NUM_ARGS = 2    # Minimum number of args
 
-    varValueD = {}  # dictionary for variable values
+    verbose = False # Flag for -v option
 
-    labelD    = {}  # dictionary for labels
+    compileOnly = False # Flag for --compile-only option
 
-    source = []     # source code
+    check = False       # Flag for --check option
 
-    lineNum = 1     # file line number
+    bufferSize = OutputSink.DEFAULT_BUFFER_SIZE # size of the output buffer
 
-    NUM_ARGS = 2    # Minimum number of args
+    outputFile = None   # file for --output option
 
-    MAX_ARGS = 3    # Maximum number of args
+    cache = None        # ProgramCache for --cache option
 
-    verbose = False # Flag for -v option
+    stream = False      # Flag for --stream option
+
+    profiler = None     # Profiler for --profile option
+
+    profileFile = None  # JSON file for --profile option
+
+    fast = False        # Flag for --fast option
+
+    hotThreshold = None # lines interpreted before translating, for --fast option
+
+    snapshotFile = None # file for --snapshot option
+
+    snapshotInterval = DEFAULT_INTERVAL # lines between snapshots, for --snapshot-interval option
+
+    tracer = None       # Tracer for --trace option
+
+    traceEvery = 1      # lines per line traced, for --trace-every option
+
+    traceOnly = None    # lines and labels traced, for --trace-only option
+
+    watch = False       # Flag for --watch option
 
     numArgs = len(argv)
 
+    usage = ("Usage: %s <BEEP source> [-v] [--compile-only] [--check] [--buffer=<size>] [--output=<file>] "
+             "[--cache[=<dir>] | --stream] [--profile[=<json file>]] [--fast[=<lines>]] "
+             "[--snapshot=<file> [--snapshot-interval=<lines>]] "
+             "[--trace[=<size>] [--trace-every=<n>] [--trace-only=<lines and labels>]]\n"
+             "       %s <BEEP source> --watch [-v] [--buffer=<size>] [--output=<file>]" % (argv[0], argv[0]))
+
     # check for correct number of arguments
-    if numArgs < NUM_ARGS or numArgs > MAX_ARGS:
-        print("Usage: %s <BEEP source> [-v]" % (argv[0]))
+    if numArgs < NUM_ARGS:
+        print(usage)
 
         sys.exit(1)
 
     # validate filename and optional command line arguments
     filename = argv[1]
 
-    if '-v' in argv:
-        verbose = True
+    for arg in argv[2:]:
+
+        if arg == '-v':
+            verbose = True
+
+        elif arg == '--compile-only':
+            compileOnly = True
+
+        elif arg == '--check':
+            check = True
+
+        elif arg.startswith('--buffer=') and arg[9:].isdigit():
+            bufferSize = int(arg[9:])
+
+        elif arg.startswith('--output=') and len(arg) > 9:
+            outputFile = arg[9:]
+
+        elif arg == '--cache':
+            cache = ProgramCache()
+
+        elif arg.startswith('--cache=') and len(arg) > 8:
+            cache = ProgramCache(arg[8:])
+
+        elif arg == '--stream':
+            stream = True
+
+        elif arg == '--profile':
+            profiler = Profiler()
+
+        elif arg.startswith('--profile=') and len(arg) > 10:
+            profiler = Profiler()
+
+            profileFile = arg[10:]
+
+        elif arg == '--fast':
+            fast = True
+
+        elif arg.startswith('--fast=') and arg[7:].isdigit():
+            fast = True
+
+            hotThreshold = int(arg[7:])
+
+        elif arg.startswith('--snapshot=') and len(arg) > 11:
+            snapshotFile = arg[11:]
+
+        elif arg.startswith('--snapshot-interval=') and arg[20:].isdigit() and int(arg[20:]) > 0:
+            snapshotInterval = int(arg[20:])
+
+        elif arg == '--trace':
+            tracer = Tracer()
+
+        elif arg.startswith('--trace=') and arg[8:].isdigit() and int(arg[8:]) > 0:
+            tracer = Tracer(int(arg[8:]))
+
+        elif arg.startswith('--trace-every=') and arg[14:].isdigit() and int(arg[14:]) > 0:
+            traceEvery = int(arg[14:])
+
+        elif arg.startswith('--trace-only=') and len(arg) > 13:
+            traceOnly = arg[13:]
+
+        elif arg == '--watch':
+            watch = True
 
-    elif numArgs == MAX_ARGS:
-        print("Usage: %s <BEEP source> [-v]" % (argv[0]))
+        else:
+            print(usage)
+
+            sys.exit(1)
+
+    if stream and cache != None:
+        print(usage)
+
+        sys.exit(1)
+
+    if watch and (compileOnly or check or cache != None or stream or profiler != None or fast
+                  or snapshotFile != None or tracer != None):
+        print(usage)
 
         sys.exit(1)
 
+    if tracer != None:
+        tracer.sampleEvery = traceEvery
+
+        if traceOnly != None:
+            setTraceFilter(tracer, traceOnly)
+
     if os.path.isfile(filename) == False:
         print("Error: %s is not a file" % (filename))
 
         sys.exit(1)
 
-    # compile the regular expressions
-    labelRE = re.compile(r'\s*(\w+):')
-    varRE = re.compile(r'^VAR\s([\w]+)\s([\w]+)\s"?(.*?)"?$')
+    out = OutputSink(open(outputFile, "w") if outputFile != None else None, bufferSize)
 
     # parse file for labels and variables and print contents
+    tokens = [] if watch else None  # tokens kept to apply edits to, for --watch option
+
+    if stream:
+        varTypeD, varValueD, labelD, slotD, source, code = streamProgram(filename, out)
+
+    else:
+        varTypeD, varValueD, labelD, slotD, source, code = loadProgram(filename, out, cache=cache, tokens=tokens)
+
+    # the streamed source holds the file open and mapped until closed
+    try:
+        # print labels and variables
+        printVariables(varTypeD, varValueD, out)
+
+        printLabels(labelD, out)
+
+        if watch:
+            program = WatchedProgram(filename, varTypeD, varValueD, labelD, slotD, source, tokens, code)
+
+            try:
+                program.run(out, verbose)
+
+                watchProgram(program, out, verbose)
+
+            except KeyboardInterrupt:
+                pass
+
+            finally:
+                out.close()
+
+            return
+
+        # the fast tier does not run the handlers a profiler or tracer wraps
+        if fast and profiler == None and tracer == None:
+            executor = FastExecutor(varTypeD, varValueD, labelD, source, slotD, out, code)
+
+            executor.hotThreshold = hotThreshold
+
+        else:
+            executor = Executor(varTypeD, varValueD, labelD, source, slotD, out, code)
+
+        # decode and check the source before running it
+        if compileOnly or check:
+            code = executor.compile()
+
+            diagnostics = checkProgram(code, labelD, varValueD, executor.slotD)
+
+            for diagnostic in diagnostics:
+                out.write("%s\n" % (diagnostic))
+
+        if compileOnly:
+            out.write("compilation ends, %d instructions\n" % (len(code)))
+
+            out.close()
+
+            return
+
+        if check and errors(diagnostics):
+            out.write("Program not executed\n")
+
+            out.close()
+
+            sys.exit(1)
+
+        if profiler != None:
+            profiler.attach(executor)
+
+        if tracer != None:
+            tracer.attach(executor)
+
+        # execute the source, the executor flushes the output
+        try:
+            if snapshotFile != None:
+                executeWithSnapshots(executor, source, snapshotFile, snapshotInterval, verbose)
+
+            elif verbose:
+                executor.execute(source, verbose=True)
+
+            else:
+                executor.execute(source)
+
+            if profiler != None:
+                profiler.report(out)
+
+                if profileFile != None:
+                    profiler.dump(profileFile)
+
+            if executor.limitReached():
+
+                if tracer != None:
+                    tracer.dump(out, "limit")
+
+                out.write("Infinite loop most likely encountered\n")
+
+                out.close()
+
+                sys.exit(1)
+
+        finally:
+            out.close()
+
+    finally:
+        if stream:
+            source.close()
+
+
+'''
+    Purpose:
+        Restricts a tracer to the lines and labels in a --trace-only list.
+
+    Parameters:
+        tracer  -  Tracer for the --trace option
+        spec    -  Comma separated line numbers, ranges of line
+                   numbers and labels
+
+    Return:
+        Void
+'''
+def setTraceFilter(tracer, spec):
+
+    lines = set()
+
+    labels = []
+
+    for item in spec.split(','):
+
+        first, dash, last = item.partition('-')
+
+        if first.isdigit() and (dash == '' or last.isdigit()):
+            lines.update(range(int(first), int(last if dash else first) + 1))
+
+        elif item != '':
+            labels.append(item)
+
+    tracer.lines = lines
+
+    tracer.labels = labels
+
+
+'''
+    Purpose:
+        Parses the BEEP source file to store labels and variables.
+
+    Parameters:
+        filename  -  Path of the BEEP source file
+        out       -  Stream or OutputSink for the listing and errors,
+                     standard output if None
+        echo      -  Print each line and its line number as it is read
+        errors    -  List that (line number, message) of each error
+                     is appended to, if not None
+        tokens    -  List that the token of each line is appended
+                     to, if not None, so the source is compiled
+                     without matching its lines again
+
+    Return:
+        Tuple of varTypeD, varValueD, labelD, slotD and the list of source lines
+'''
+def loadSource(filename, out=None, echo=True, errors=None, tokens=None):
 
     file = open(filename, "r", encoding='latin-1')
 
-    print('BEEP source code in %s:' %(filename))
+    try:
+        return parseSource(file, filename, out, echo, errors, tokens)
+
+    finally:
+        file.close()
+
+
+'''
+    Purpose:
+        Reads BEEP source from an open file to store labels and variables.
+
+    Parameters:
+        file      -  Text file to read the source from
+        filename  -  Name of the source for the listing
+        out, echo, errors, tokens  -  As for loadSource
+
+    Notes:
+        The file is read in one call and each line is matched once,
+        by the Lexer.
+
+    Return:
+        Tuple of varTypeD, varValueD, labelD, slotD and the list of source lines
+'''
+def parseSource(file, filename, out=None, echo=True, errors=None, tokens=None):
+
+    varTypeD  = {}  # dictionary for variable types
+
+    varValueD = {}  # dictionary for variable values
+
+    labelD    = {}  # dictionary for labels
+
+    slotD     = {}  # dictionary for variable slots
+
+    source = file.readlines()   # source code
 
-    while True:
+    out = out if out != None else sys.stdout
 
-        line = file.readline()
+    if echo:
+        out.write('BEEP source code in %s:\n' %(filename))
 
-        if line == "":
-            break
+    lineTokens = tokenize(source)
 
-        if labelRE.match(line) != None:
+    for lineNum, token in enumerate(lineTokens, 1):
 
-            labelMO = labelRE.match(line)
+        label = token.group('label')
 
-            label = labelMO.group(1).upper()
+        if label != None:
+
+            label = label.upper()
 
             if labelD.get(label, None) != None:
-                print("***Error: label '%s' appears on multiple lines: %d and %d" % (label, labelD[label], lineNum))
+                message = "***Error: label '%s' appears on multiple lines: %d and %d\n" % (label, labelD[label], lineNum)
+
+                out.write(message)
+
+                if errors != None:
+                    errors.append((lineNum, message))
 
             else:
                 labelD[label] = lineNum
 
-        elif varRE.match(line) != None:
+        elif declares(token):
+            declareVar(token, varTypeD, varValueD, slotD)
 
-            varMO = varRE.match(line)
+        # print line and line number
+        if echo:
+            out.write("%d. %s\n" %(lineNum, token.string))
 
-            declareVar(varMO, varTypeD, varValueD)
+    if tokens != None:
+        tokens.extend(lineTokens)
 
-        source.append(line)
+    return varTypeD, varValueD, labelD, slotD, source
 
-        # print line and line number
-        print("%d. %s" %(lineNum, line))
 
-        lineNum += 1
+'''
+    Purpose:
+        Pauses the cyclic garbage collector while a program is loaded.
+
+    Notes:
+        Loading keeps a token, an instruction and its operands for
+        every line, none of them in a reference cycle, and the
+        collector would otherwise traverse all of them again and
+        again as they are allocated.
+'''
+@contextlib.contextmanager
+def collectorPaused():
 
-    # print labels and variables
-    printVariables(varTypeD, varValueD)
+    enabled = gc.isenabled()
 
-    printLabels(labelD)
+    gc.disable()
 
-    executor = Executor(varTypeD, varValueD, labelD, source)
+    try:
+        yield
 
-    # execute the source
-    if verbose:
-        executor.execute(source, verbose=True)
+    finally:
 
-    else:
-        executor.execute(source)
+        if enabled:
+            gc.enable()
+
+
+'''
+    Purpose:
+        Loads and compiles a BEEP program, from the cache if the
+        source has not changed since it was cached.
+
+    Parameters:
+        filename  -  Path of the BEEP source file
+        out       -  Stream or OutputSink for the listing and errors,
+                     standard output if None
+        echo      -  Print each line and its line number
+        cache     -  ProgramCache to use, None to always parse the source
+        tokens    -  List that the token of each line is appended
+                     to, if not None; the cache is then not used
+
+    Notes:
+        The listing and label errors printed for a cached program
+        are the same as when the source is parsed.
+
+    Return:
+        Tuple of varTypeD, varValueD, labelD, slotD, the list of
+        source lines and the compiled instructions
+'''
+def loadProgram(filename, out=None, echo=True, cache=None, tokens=None):
+
+    if cache == None or tokens != None:
+        # the source is compiled from the tokens the loader matched
+        if tokens == None:
+            tokens = []
+
+        with collectorPaused():
+            varTypeD, varValueD, labelD, slotD, source = loadSource(filename, out, echo, tokens=tokens)
+
+            return varTypeD, varValueD, labelD, slotD, source, compileSource(source, labelD, slotD, tokens)
+
+    out = out if out != None else sys.stdout
+
+    with open(filename, "rb") as file:
+        data = file.read()
+
+    key = cache.key(data)
+
+    entry = cache.get(key)
+
+    if entry == None:
+        errors = []
+
+        tokens = []
+
+        # decoded the same way loadSource reads the file
+        file = io.TextIOWrapper(io.BytesIO(data), encoding='latin-1')
+
+        with collectorPaused():
+            varTypeD, varValueD, labelD, slotD, source = parseSource(file, filename, out, echo, errors, tokens)
+
+            code = compileSource(source, labelD, slotD, tokens)
+
+        entry = (varTypeD, varValueD, labelD, slotD, source, code, errors)
+
+        cache.put(key, entry)
+
+        return entry[:6]
+
+    varTypeD, varValueD, labelD, slotD, source, code, errors = entry
+
+    # replay the listing with each error before its line, as parseSource prints them
+    errorD = {}
+
+    for lineNum, message in errors:
+        errorD.setdefault(lineNum, []).append(message)
+
+    if echo:
+        out.write('BEEP source code in %s:\n' %(filename))
+
+    for lineNum, line in enumerate(source, 1):
+
+        for message in errorD.get(lineNum, ()):
+            out.write(message)
+
+        if echo:
+            out.write("%d. %s\n" %(lineNum, line))
+
+    return entry[:6]
 
 
 if __name__ == "__main__":
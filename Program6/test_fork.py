@@ -0,0 +1,114 @@
+from p6Driver import loadProgram
+from Executor import Executor
+from FastTier import FastExecutor
+from OutputSink import OutputSink
+import io, os, unittest
+
+'''
+Checks that a fork of a compiled executor runs with the values it is
+given, including values of variables folded into the instructions
+'''
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'p6InputL.txt')
+
+
+'''
+Builds an executor for the sample loop, its declared values
+replaced by overrides
+'''
+def newExecutor(overrides=None, cls=Executor):
+
+    varTypeD, varValueD, labelD, slotD, source, code = loadProgram(SOURCE, io.StringIO(), echo=False)
+
+    for name, value in (overrides or {}).items():
+        varValueD[name.upper()] = value
+
+    return cls(varTypeD, varValueD, labelD, source, slotD, OutputSink(capture=True), code)
+
+
+class ForkTest(unittest.TestCase):
+
+    # ITER and LIMIT are never assigned, so compiling folds their declared values
+    OVERRIDES = {'iter': 1, 'limit': 100}
+
+    def testOverrideOfFoldedVariable(self):
+
+        base = newExecutor()
+
+        base.compile()
+
+        self.assertTrue(base.slotD['ITER'] in base.constSlots)
+
+        fork = base.fork(OutputSink(capture=True), ForkTest.OVERRIDES)
+
+        fork.execute(fork.source)
+
+        expected = newExecutor(ForkTest.OVERRIDES)
+
+        expected.execute(expected.source)
+
+        self.assertEqual(fork.execCount, expected.execCount)
+
+        self.assertEqual(fork.out.getvalue(), expected.out.getvalue())
+
+        self.assertEqual(fork.variableValues(), expected.variableValues())
+
+    def testOverrideAfterTranslation(self):
+
+        base = newExecutor(cls=FastExecutor)
+
+        base.hotThreshold = 1
+
+        # suspended inside the loop, after the fast tier has translated the program
+        base.execute(base.source, stepBudget=12)
+
+        self.assertTrue(base.program != None)
+
+        fork = base.fork(OutputSink(capture=True), ForkTest.OVERRIDES)
+
+        fork.resume()
+
+        expected = newExecutor()
+
+        expected.execute(expected.source, stepBudget=12)
+
+        expected = expected.fork(OutputSink(capture=True), ForkTest.OVERRIDES)
+
+        expected.resume()
+
+        self.assertEqual(fork.execCount, expected.execCount)
+
+        self.assertEqual(fork.out.getvalue(), expected.out.getvalue())
+
+        self.assertEqual(fork.variableValues(), expected.variableValues())
+
+    def testBaseKeepsItsInstructions(self):
+
+        base = newExecutor()
+
+        base.compile()
+
+        code = base.code
+
+        base.fork(OutputSink(capture=True), ForkTest.OVERRIDES)
+
+        base.execute(base.source)
+
+        expected = newExecutor()
+
+        expected.execute(expected.source)
+
+        self.assertIs(base.code, code)
+
+        self.assertEqual(base.execCount, expected.execCount)
+
+        self.assertEqual(base.out.getvalue(), expected.out.getvalue())
+
+    def testUnknownVariable(self):
+
+        with self.assertRaises(KeyError):
+            newExecutor().fork(OutputSink(capture=True), {'nosuch': 1})
+
+
+if __name__ == "__main__":
+    unittest.main()